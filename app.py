@@ -1,23 +1,17 @@
 import uuid
 
 import streamlit as st
-from langchain.schema import Document
-from langchain_community.vectorstores import FAISS
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-
-import time
+import asyncio
+from concurrent.futures import as_completed, TimeoutError
 from datetime import datetime
 
 from recommender import *
-from vector_db import build_vectorstore, build_qa_chain
-from data_loader import load_dataframe
+from vector_db import build_vectorstore, build_qa_chain, build_follow_up_chain, build_movie_subindex, get_embedding_model, stream_chain_answer
+from data_loader import get_dataframe, build_documents
+from thumbnails import get_thumbnail_service
+from intent_router import route_query
 from config import model_name, embedding_model_name
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.chat_models import ChatOpenAI
-from langchain.chains import ConversationalRetrievalChain
 
 # Streamlit 페이지 기본 설정
 st.set_page_config(
@@ -42,17 +36,14 @@ load_css()
 # -----------------------------------------------------------------------------
 @st.cache_resource(show_spinner="초기화 중…")
 def initialize_models():
-    embedding_model = OpenAIEmbeddings(model=embedding_model_name)
-    llm = ChatOpenAI(model_name=model_name, temperature=0.3)
-    df = load_dataframe()[:100]
-    vectorstore_global = build_vectorstore(
-        df["document"].apply(lambda x: Document(page_content=x, metadata={})).tolist()
-    )
+    embedding_model = get_embedding_model()
+    df = get_dataframe()[:100]
+    vectorstore_global = build_vectorstore(build_documents(df))
     qa_chain = build_qa_chain(vectorstore_global)
-    return embedding_model, llm, df, qa_chain
+    return embedding_model, df, vectorstore_global, qa_chain
 
 # 초기화 함수를 호출하여 필요한 모델과 데이터를 가져옴
-embedding_model, llm, df, qa_chain = initialize_models()
+embedding_model, df, vectorstore_global, qa_chain = initialize_models()
 
 # 영화 추천에 사용될 키워드 컬럼 리스트 정의
 keyword_columns: List[str] = [
@@ -97,47 +88,86 @@ def set_branch(branch_key: str):
 # -----------------------------------------------------------------------------
 # 썸네일 관련 헬퍼 --------------------------------------------------------------
 # -----------------------------------------------------------------------------
-def get_wavve_thumbnail_cached(movieid):
+NO_POSTER_URL = "static/no_poster.png"
+
+
+def poster_card_html(content_id, title, img_url) -> str:
+    """Wavve 링크와 함께 영화 포스터 카드 HTML을 만듭니다."""
+    wavve_url = f"https://www.wavve.com/player/movie?movieid={content_id}"
+    return f"""
+        <div class='poster-card'>
+            <a href="{wavve_url}" target="_blank" class="poster-link">
+                <img src="{img_url}" alt="{title}">
+                <p>{title}</p>
+            </a>
+        </div>
+        """
+
+
+def get_known_thumbnails(content_ids) -> dict:
     """
-    Wavve에서 영화 썸네일 URL을 가져오고 캐시합니다.
-    만약 캐시에 이미 URL이 있으면 캐시된 값을 반환합니다.
+    이미 조회된 썸네일 URL만 반환합니다 (세션 캐시 → 공유 썸네일 캐시).
+    새 크롤링은 하지 않으므로 매 rerun마다 호출해도 됩니다.
     """
     cache = st.session_state.thumbnail_cache
-    if movieid in cache:
-        return cache[movieid]
+    known = {cid: cache[cid] for cid in content_ids if cid in cache}
+    missing = [cid for cid in content_ids if cid not in known]
+    if missing:
+        found = get_thumbnail_service().get_cached(missing)
+        cache.update(found)
+        known.update(found)
+    return known
+
+
+def request_posters(df_recommend, max_items: int = 3) -> dict:
+    """
+    추천 카드의 포스터 조회를 백그라운드에서 시작하고 {content_id: Future}를 반환합니다.
+    응답 스트리밍 전에 호출해 두면 답변을 출력하는 동안 조회가 진행됩니다.
+    """
+    content_ids = [str(c) for c in df_recommend["content_id"].tolist()[:max_items] if c]
+    known = get_known_thumbnails(content_ids)
+    service = get_thumbnail_service()
+    return {cid: service.submit(cid) for cid in content_ids if cid not in known}
+
 
+# 답변을 출력한 뒤 포스터를 기다리는 최대 시간 (늦게 도착한 포스터는 다음 rerun에서 get_known_thumbnails로 표시)
+poster_wait_timeout = 3
+
+
+def fill_poster_placeholders(placeholders: dict, poster_futures: dict, timeout: float = poster_wait_timeout):
+    """
+    조회가 끝나는 순서대로 no_poster 자리의 카드를 실제 포스터로 교체합니다.
+    timeout초 안에 끝나지 않은 조회는 기다리지 않습니다. 조회 결과는 공유 썸네일 캐시에 저장되므로
+    다음 rerun에서 get_known_thumbnails가 찾아 그립니다.
+    """
+    futures = {poster_futures[cid]: cid for cid in placeholders if cid in poster_futures}
     try:
-        url = f"https://www.wavve.com/player/movie?movieid={movieid}"
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.get(url)
-        time.sleep(2)
-        img_tag = driver.find_element(By.CSS_SELECTOR, ".detail-view-box .thumb-box .picture-area img")
-        img_url = img_tag.get_attribute("src")
-        driver.quit()
-        if img_url:
-            cache[movieid] = img_url
-            return img_url
-    except Exception as e:
-        print("썸네일 크롤링 실패:", e)
-    return "static/no_poster.png"
-
-
-
-def render_recommendation_thumbnails(df_recommend, key_prefix: str = "", max_items: int = 3):
+        for future in as_completed(futures, timeout=timeout):
+            cid = futures[future]
+            img_url = future.result()
+            if img_url:
+                st.session_state.thumbnail_cache[cid] = img_url
+                placeholder, title = placeholders[cid]
+                placeholder.markdown(poster_card_html(cid, title, img_url), unsafe_allow_html=True)
+    except TimeoutError:
+        print("썸네일 조회 시간 초과:", [cid for f, cid in futures.items() if not f.done()])
+
+
+def render_recommendation_thumbnails(df_recommend, key_prefix: str = "", max_items: int = 3) -> dict:
     """
     추천 영화에 대한 썸네일과 액션 버튼(좋아요/싫어요)을 렌더링합니다.
     `key_prefix`는 다른 컨텍스트에서 호출될 때 버튼의 고유성을 보장하기 위해 버튼 키에 추가됩니다.
+    이미 조회된 포스터만 사용하고, 없으면 no_poster 이미지로 카드를 바로 그립니다.
+    반환값: 포스터를 나중에 채울 카드의 {content_id: (placeholder, title)}
     """
     # 추천 결과가 없는 경우
     if df_recommend is None:
         st.markdown("📭 아직 추천된 영화가 없습니다.")
-        return
+        return {}
 
     rows = list(df_recommend.itertuples())[:max_items]
+    known = get_known_thumbnails([str(row.content_id) for row in rows if row.content_id])
+    placeholders = {}
 
     # 좋아요/싫어요 상태 저장을 위한 세션 상태 딕셔너리 초기화 (없을 경우)
     if "liked_movies" not in st.session_state:
@@ -152,23 +182,14 @@ def render_recommendation_thumbnails(df_recommend, key_prefix: str = "", max_ite
         with cols[idx]:
 
             title = row.title
-            content_id = row.content_id
-            # 썸네일 URL 가져오기 (캐시 사용)
-            img_url = get_wavve_thumbnail_cached(content_id) if content_id else None
-            if img_url:
-                wavve_url = f"https://www.wavve.com/player/movie?movieid={content_id}"
-                # Wavve 링크와 함께 영화 포스터 카드 렌더링
-                st.markdown(
-                    f"""
-                    <div class='poster-card'>
-                        <a href="{wavve_url}" target="_blank" class="poster-link">
-                            <img src="{img_url}" alt="{title}">
-                            <p>{title}</p>
-                        </a>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
+            content_id = str(row.content_id) if row.content_id else None
+            if content_id:
+                # 조회된 포스터가 없으면 no_poster로 먼저 그리고, 자리를 기록해 두었다가 교체
+                img_url = known.get(content_id)
+                card = st.empty()
+                card.markdown(poster_card_html(content_id, title, img_url or NO_POSTER_URL), unsafe_allow_html=True)
+                if not img_url:
+                    placeholders[content_id] = (card, title)
 
             # 영화의 현재 좋아요/싫어요 상태를 확인합니다.
             liked = st.session_state.liked_movies.get(title, False)
@@ -183,31 +204,58 @@ def render_recommendation_thumbnails(df_recommend, key_prefix: str = "", max_ite
                 if st.button("👍 좋아요", key=f"{key_prefix}main_like_{idx}_{title}_{st.session_state.user_id}", disabled=liked):
                     st.session_state.liked_movies[title] = True
                     # 선택적으로, 좋아요 영화에 대한 피드백 메커니즘을 추가하거나 여기에서 데이터베이스를 업데이트할 수 있습니다.
-                    save_feedback(
+                    future = save_feedback(
                         interaction_id=st.session_state.interaction_id,
                         movie_title=title,
                         is_selected=True,
                         is_disliked=False,
                         feedback_text=""
                     )
+                    track_feedback_write("좋아요", title, [future])
 
             with col2:
                 # 각 버튼에 고유한 키를 사용합니다.
                 if st.button("👎 싫어요", key=f"{key_prefix}main_dislike_{idx}_{title}_{st.session_state.user_id}", disabled=disliked):
                     try:
-                        # 데이터베이스에 사용자 싫어요 목록에 영화를 추가합니다.
-                        add_user_dislike(st.session_state.user_id, "title", title)
-                        save_feedback(
-                            interaction_id=st.session_state.interaction_id,
-                            movie_title=title,
-                            is_selected=False,
-                            is_disliked=True,
-                            feedback_text=""
-                        )
+                        # 데이터베이스에 사용자 싫어요 목록에 영화를 추가합니다 (커밋은 백그라운드에서).
+                        futures = [
+                            add_user_dislike(st.session_state.user_id, "title", title),
+                            save_feedback(
+                                interaction_id=st.session_state.interaction_id,
+                                movie_title=title,
+                                is_selected=False,
+                                is_disliked=True,
+                                feedback_text=""
+                            ),
+                        ]
                         st.session_state.disliked_movies[title] = True
+                        track_feedback_write("싫어요", title, futures)
                     except Exception as e:
                         st.error(f"싫어요 저장 중 오류가 발생했습니다: {str(e)}")
 
+    return placeholders
+
+def track_feedback_write(label: str, title: str, futures: list):
+    """큐에 넣은 좋아요/싫어요 저장을 기록해 두었다가 report_failed_feedback에서 결과를 확인"""
+    st.session_state.setdefault("pending_feedback", []).append((label, title, futures))
+
+def report_failed_feedback():
+    """
+    이전 실행에서 큐에 넣은 좋아요/싫어요 저장 중 실패한 것이 있으면 오류를 표시하고 버튼 상태를 되돌립니다.
+    아직 커밋되지 않은 것은 다음 실행에서 다시 확인합니다.
+    """
+    remaining = []
+    for label, title, futures in st.session_state.get("pending_feedback", []):
+        if not all(future.done() for future in futures):
+            remaining.append((label, title, futures))
+            continue
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            st.error(f"{label} 저장 중 오류가 발생했습니다: {str(errors[0])}")
+            state = st.session_state.liked_movies if label == "좋아요" else st.session_state.disliked_movies
+            state.pop(title, None)
+    st.session_state.pending_feedback = remaining
+
 def initialization():
     """
     메소드 초기화
@@ -225,6 +273,7 @@ def initialization():
     st.session_state.chat_history = []  # 전체 채팅 기록을 저장합니다.
     st.session_state.show_recommendations = False  # 사이드바에 이전 추천을 표시하기 위한 토글
     st.session_state.interaction_id = None
+    st.session_state.pending_feedback = []  # 커밋 결과를 아직 확인하지 않은 좋아요/싫어요 저장
 
 
 
@@ -234,6 +283,9 @@ def initialization():
 if "__initialized__" not in st.session_state:
     initialization()
 
+# 이전 실행에서 큐에 넣은 좋아요/싫어요 저장이 실패했으면 알림
+report_failed_feedback()
+
 
 # -----------------------------------------------------------------------------
 # 채팅 기록 관리 함수 -----------------------------------------------------------
@@ -274,6 +326,7 @@ def display_chat_history():
                     df = pd.read_json(message["content"], orient="records")
                     st.write("다음과 같은 추천 결과가 있습니다:")
                     st.dataframe(df)  # 데이터프레임을 Streamlit의 dataframe으로 표시
+                    # 지난 추천 카드는 이미 조회된 포스터만 사용 (새 크롤링 없음)
                     render_recommendation_thumbnails(df, message["key_prefix"])
                 except Exception as e:
                     st.warning(f"추천 데이터프레임을 로드하는 데 실패했습니다: {e}")
@@ -464,10 +517,17 @@ if user_query.lower() in {"exit", "quit", "종료", "고마워 사만다"} or "
     initialization()
     st.rerun()
 
+# 입력 의도(완료/후속 질문/유사 추천/재추천/추천 요청)를 한 번의 순회로 분류
+last_recommend_df = st.session_state.last_recommend_df
+route = route_query(
+    user_query,
+    last_recommend_df["title"].tolist() if last_recommend_df is not None and not last_recommend_df.empty else []
+)
+
 # -----------------------------------------------------------------------------
 # 5‑0. 완료 처리 ---------------------------------------------------------------
 # -----------------------------------------------------------------------------
-if "완료" in user_query:
+if "complete" in route:
     if st.session_state.last_recommend_df is None or st.session_state.last_recommend_df.empty:
         error_message = "⚠️ 이전에 추천된 영화가 없습니다. 먼저 추천을 받아주세요."
         with st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR):
@@ -494,25 +554,22 @@ if (
     not st.session_state.last_recommend_df.empty
 ):
     # (a) 후속 질문
-    if is_follow_up_question(user_query, st.session_state.last_recommend_df["title"].tolist()):
+    if "follow_up" in route:
         set_branch("follow_up")
         st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write("📌 후속 질문으로 판단됨 → 이전 추천 콘텐츠에서 검색 중…")
-        local_docs = [
-            Document(page_content=truncate_document(r.document), metadata={"title": r.title})
-            for r in st.session_state.last_recommend_df.itertuples()
-        ]
-        answer = ConversationalRetrievalChain.from_llm(
-            llm=llm,
-            retriever=FAISS.from_documents(local_docs, embedding_model).as_retriever(),
-            memory=None
-        ).invoke({"question": user_query, "chat_history": []})["answer"]
-        st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write(answer)
+        # 글로벌 인덱스의 벡터를 재사용해 추천된 영화만으로 검색 (재임베딩 없음)
+        local_store = build_movie_subindex(vectorstore_global, st.session_state.last_recommend_df, embedding_model)
+        local_chain = build_follow_up_chain(local_store)
+        # 답변 토큰을 생성되는 대로 표시하고, 완성된 텍스트를 기록
+        answer = st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write_stream(
+            stream_chain_answer(local_chain, {"question": user_query, "chat_history": []})
+        )
         add_to_chat_history("assistant", answer)
         st.session_state.first_turn = False
         st.stop()
 
     # (b) 유사 추천
-    if is_similar_recommendation(user_query):
+    if "similar" in route:
         set_branch("similar")
         df_sim = handle_similar_recommendation(
             user_query, df, st.session_state.user_id, st.session_state.selected_title, extract_user_meta, keyword_columns
@@ -523,9 +580,11 @@ if (
             add_to_chat_history("assistant", "죄송해요, 유사한 콘텐츠를 찾지 못했어요.")
             st.stop()
 
-        resp = generate_recommendation_response(user_query, df_sim, st.session_state.user_name)
-
-        st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write(resp)
+        # 포스터 조회는 답변 스트리밍과 동시에 백그라운드에서 진행
+        poster_futures = request_posters(df_sim)
+        resp = st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write_stream(
+            stream_recommendation_response(user_query, df_sim, st.session_state.user_name)
+        )
         add_to_chat_history("assistant", resp)
 
         log_recommendations(interaction_id, df_sim["title"].tolist())
@@ -535,84 +594,79 @@ if (
         st.session_state.last_recommend_query = user_query
         st.session_state.first_turn = False
 
-        # 메인 영역에 새 추천을 렌더링합니다.
-        render_recommendation_thumbnails(df_sim, key_prefix="similar_recommend_")
+        # 메인 영역에 새 추천을 렌더링하고, 포스터는 준비되는 대로 채웁니다.
+        placeholders = render_recommendation_thumbnails(df_sim, key_prefix="similar_recommend_")
         add_to_chat_history("assistant", df_sim, "similar_recommend_", "dataframe")
+        fill_poster_placeholders(placeholders, poster_futures)
 
         st.stop()
 
     # (c) 재추천
-    is_retry, _ = is_retry_request(user_query)
+    is_retry = "retry" in route
     if is_retry and st.session_state.last_recommend_query:
         set_branch("retry")
         merged_query = st.session_state.last_recommend_query
-        user_meta = extract_user_meta(merged_query)
-        df_ret = handle_recommendation(
-            df,
-            st.session_state.user_id,
-            user_meta,
-        )
     else:
         set_branch("follow_up")
         merged_query = user_query
-        user_meta = extract_user_meta(merged_query)
         st.session_state.last_recommend_query = merged_query
-        df_ret = handle_recommendation(
-            df,
-            st.session_state.user_id,
-            user_meta,
-        )
+
+    # 키워드 추출/필터 조회를 겹쳐 실행 (추천 로그는 백그라운드 저장)
+    turn = asyncio.run(recommend_turn(
+        merged_query, df, st.session_state.user_id, st.session_state.user_name,
+        interaction_id=interaction_id,
+        is_retry=is_retry,
+        stream=True
+    ))
+    df_ret = turn["df_recommend"]
 
     if df_ret is None or df_ret.empty:
         st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write("죄송해요, 추천할 콘텐츠를 찾지 못했어요.")
         add_to_chat_history("assistant", "죄송해요, 추천할 콘텐츠를 찾지 못했어요.")
         st.stop()
 
-    resp = generate_recommendation_response(merged_query, df_ret, st.session_state.user_name, is_retry=is_retry)
-
-    st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write(resp)
+    # 응답은 토큰 단위로 표시하고, 포스터 조회는 그동안 백그라운드에서 진행
+    poster_futures = request_posters(df_ret)
+    resp = st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write_stream(turn["response_stream"])
     add_to_chat_history("assistant", resp)
 
-    log_recommendations(interaction_id, df_ret["title"].tolist())
-
     st.session_state.previous_titles.update(df_ret["title"].tolist())
     st.session_state.last_recommend_df = df_ret.copy()
     st.session_state.first_turn = False
 
-    render_recommendation_thumbnails(df_ret, key_prefix="retry_recommend_")
+    placeholders = render_recommendation_thumbnails(df_ret, key_prefix="retry_recommend_")
     add_to_chat_history("assistant", df_ret, "retry_recommend_", "dataframe")
+    fill_poster_placeholders(placeholders, poster_futures)
 
     st.stop()
 
 # -----------------------------------------------------------------------------
 # 5‑2. 첫 추천 -----------------------------------------------------------------
 # -----------------------------------------------------------------------------
-if st.session_state.first_turn and is_recommendation_request(user_query):
+if st.session_state.first_turn and "recommendation" in route:
     set_branch("first")
-    user_meta = extract_user_meta(user_query)
-    df_first = handle_recommendation(
-        df,
-        st.session_state.user_id,
-        user_meta,
-    )
+    turn = asyncio.run(recommend_turn(
+        user_query, df, st.session_state.user_id, st.session_state.user_name,
+        interaction_id=interaction_id,
+        stream=True
+    ))
+    df_first = turn["df_recommend"]
     if df_first.empty:
         st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write("죄송해요, 적절한 콘텐츠를 찾지 못했어요.")
         add_to_chat_history("assistant", "죄송해요, 적절한 콘텐츠를 찾지 못했어요.")
         st.stop()
 
-    resp = generate_recommendation_response(user_query, df_first, st.session_state.user_name)
-
-    st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write(resp)
+    poster_futures = request_posters(df_first)
+    resp = st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write_stream(turn["response_stream"])
     add_to_chat_history("assistant", resp)
 
-    log_recommendations(interaction_id, df_first["title"].tolist())
-
     st.session_state.previous_titles.update(df_first["title"].tolist())
     st.session_state.last_recommend_df = df_first.copy()
     st.session_state.first_turn = False
 
-    render_recommendation_thumbnails(df_first, key_prefix="first_recommend_")
+    placeholders = render_recommendation_thumbnails(df_first, key_prefix="first_recommend_")
     add_to_chat_history("assistant", df_first, "first_recommend_", "dataframe")
+    fill_poster_placeholders(placeholders, poster_futures)
 
     st.stop()
 
@@ -621,8 +675,9 @@ if st.session_state.first_turn and is_recommendation_request(user_query):
 # -----------------------------------------------------------------------------
 else:
     set_branch("qa")
-    answer = qa_chain.invoke({"question": user_query})["answer"]
-    st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write(answer)
+    answer = st.chat_message("assistant", avatar=SOGANG_HAWK_AVATAR).write_stream(
+        stream_chain_answer(qa_chain, {"question": user_query})
+    )
     add_to_chat_history("assistant", answer)
     st.session_state.first_turn = False
 
@@ -0,0 +1,129 @@
+"""
+Query benchmark for the per-user helpers in database.py.
+
+Builds a throwaway database with millions of synthetic rows, then for each
+helper prints the query plan and latency before and after the index
+migration. Run from anywhere:
+
+    python benchmarks/db_queries.py [--interactions 1000000] [--repeat 50]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database
+
+# 인덱스 마이그레이션 직전 버전 (기본 테이블 + 키워드 캐시)
+BASELINE_VERSION = 2
+
+HELPERS = [
+    ("get_previous_recommendations", database.get_previous_recommendations),
+    ("get_user_dislikes", database.get_user_dislikes),
+    ("get_feedback_by_user_id", database.get_feedback_by_user_id),
+]
+
+
+def fill(conn, users: int, interactions: int, seed: int = 0):
+    """users명, interactions건의 입력과 그에 딸린 추천 로그(3건씩)/피드백/싫어요를 생성"""
+    rng = random.Random(seed)
+    conn.executemany("INSERT INTO users (user_name) VALUES (?)", ((f"user{i}",) for i in range(users)))
+    batch = 100_000
+    for start in range(0, interactions, batch):
+        stop = min(start + batch, interactions)
+        conn.executemany(
+            "INSERT INTO user_interactions (id, user_id, user_input) VALUES (?, ?, ?)",
+            ((i + 1, rng.randint(1, users), "영화 추천해줘") for i in range(start, stop))
+        )
+        conn.executemany(
+            "INSERT INTO recommendation_logs (interaction_id, movie_title) VALUES (?, ?)",
+            ((i + 1, f"movie{rng.randrange(3000)}") for i in range(start, stop) for _ in range(3))
+        )
+        conn.executemany(
+            "INSERT INTO user_feedback (interaction_id, movie_title, is_selected, is_disliked, feedback_text) VALUES (?, ?, ?, ?, '')",
+            ((i + 1, f"movie{rng.randrange(3000)}", 1, 0) for i in range(start, stop) if i % 4 == 0)
+        )
+        conn.executemany(
+            "INSERT INTO user_dislikes (user_id, category, value) VALUES (?, ?, ?)",
+            ((rng.randint(1, users), rng.choice(["title", "genre", "actor"]), f"value{i}") for i in range(start, stop) if i % 10 == 0)
+        )
+        conn.commit()
+
+
+def query_plan(db_path: str, helper, user_id: int) -> list:
+    """helper가 실행하는 SQL을 추적해 EXPLAIN QUERY PLAN 결과를 반환"""
+    conn = database.get_connection(db_path)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        helper(user_id, db_path=db_path)
+    finally:
+        conn.set_trace_callback(None)
+    select = next(s for s in statements if s.lstrip().lower().startswith("select"))
+    # 재사용 연결의 statement 캐시에 남은 이전 계획이 아니라 현재 스키마 기준 계획을 보기 위해 새 연결 사용
+    plan_conn = database.connect(db_path)
+    try:
+        return [row[-1] for row in plan_conn.execute("EXPLAIN QUERY PLAN " + select)]
+    finally:
+        plan_conn.close()
+
+
+def measure(db_path: str, helper, user_ids, repeat: int) -> list:
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        helper(user_ids[i % len(user_ids)], db_path=db_path)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, db_path: str, user_ids, repeat: int):
+    print(f"\n## {label} (schema version {database.get_schema_version(database.get_connection(db_path))})")
+    for name, helper in HELPERS:
+        timings = measure(db_path, helper, user_ids, repeat)
+        print(f"{name:<30} median {statistics.median(timings) * 1000:>9.2f} ms   max {max(timings) * 1000:>9.2f} ms")
+        for step in query_plan(db_path, helper, user_ids[0]):
+            print(f"    {step}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--interactions", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        conn = database.connect(db_path)
+        database.migrate(conn, target_version=BASELINE_VERSION)
+
+        start = time.perf_counter()
+        fill(conn, args.users, args.interactions)
+        rows = sum(conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                   for t in ("users", "user_interactions", "recommendation_logs", "user_feedback", "user_dislikes"))
+        print(f"{rows:,} rows generated in {time.perf_counter() - start:.1f} s")
+
+        # get_connection이 최신 버전으로 마이그레이션하지 않도록 초기화된 것으로 표시
+        database._initialized_dbs.add(db_path)
+        user_ids = random.Random(1).sample(range(1, args.users + 1), min(args.repeat, args.users))
+        report("before index migration", db_path, user_ids, args.repeat)
+
+        start = time.perf_counter()
+        database.migrate(conn)
+        print(f"\nindex migration applied in {time.perf_counter() - start:.1f} s")
+        report("after index migration", db_path, user_ids, args.repeat)
+
+        conn.close()
+        database.close_connection(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Import-time benchmark for the project modules.
+
+Each module is imported in a fresh interpreter so earlier imports do not hide
+its cost. Run from anywhere:
+
+    python benchmarks/import_time.py [--repeat 5] [module ...]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "config", "catalog_index", "embedding_cache", "filters", "utils",
+    "database", "data_loader", "vector_db", "recommender", "main",
+]
+
+SNIPPET = """
+import time
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t)
+"""
+
+
+def measure(module: str, repeat: int) -> list:
+    """module을 새 인터프리터에서 repeat번 import하고 걸린 시간(초) 목록을 반환"""
+    timings = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", SNIPPET.format(module=module)],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"{module} import 실패:\n{result.stderr.strip()}")
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'module':<16}{'min (ms)':>12}{'median (ms)':>14}")
+    for module in args.modules:
+        try:
+            timings = measure(module, args.repeat)
+        except RuntimeError as e:
+            print(f"{module:<16}{'error':>12}  {e.args[0].splitlines()[-1]}")
+            continue
+        print(f"{module:<16}{min(timings) * 1000:>12.1f}{statistics.median(timings) * 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Golden cases and micro-benchmark for intent_router.
+
+Checks that the single-pass router returns the expected intents and spans for
+a fixed set of queries, and that it agrees with the per-intent functions in
+utils.py (plus the title/credit regexes they use) on those queries and on
+randomly composed ones. Then times both approaches. Run from anywhere, or
+from the project root with --catalog to spot previous titles through the
+catalog-wide title automaton:
+
+    python benchmarks/intent_router.py [--random 5000] [--repeat 2000] [--catalog]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from catalog_index import get_catalog_index
+from intent_router import route_query
+from utils import (
+    is_follow_up_question, is_movie_info_related, is_recommendation_request, is_retry_request,
+    is_similar_recommendation,
+)
+
+PREVIOUS = ["(더빙) 겨울왕국 2", "밀정", "살인의 추억", "의형제", "변호인"]
+
+# (입력, 이전 추천 제목, 기대 의도, 기대 추출 {항목: 문자열})
+GOLDEN = [
+    ("신나는 액션 영화 추천해줘", [], {"recommendation"}, {}),
+    ("주말에 볼만한 영화 있어?", [], {"recommendation"}, {}),
+    ("우울할 때 보고싶어", [], {"recommendation"}, {}),
+    ("이 중에 제일 무서운 건 뭐야?", PREVIOUS, {"follow_up"}, {}),
+    ("밀정은 몇 분짜리야?", PREVIOUS, {"follow_up"}, {}),
+    ("방금 추천한 영화 중에 감독이 누구야", PREVIOUS, {"follow_up", "movie_info"}, {"credit": "방금 추천한 영화 중에"}),
+    ("밀정 완료", PREVIOUS, {"complete", "follow_up"}, {}),
+    ("겨울왕국 2 완료", PREVIOUS, {"complete", "follow_up"}, {}),
+    ("더빙 겨울왕국2는 몇 분이야", PREVIOUS, {"follow_up"}, {}),
+    ("영화밀정", PREVIOUS, set(), {}),
+    # 본제목/연도 없는 제목으로 언급한 이전 추천 (다른 카탈로그 제목이 같은 변형을 가져도 찾아야 함)
+    ("뮬란 어땠어?", ["(더빙) 뮬란 (2020)"], {"follow_up"}, {}),
+    ("스파이더맨 어땠어?", ["(더빙) 스파이더맨: 노 웨이 홈"], {"follow_up"}, {}),
+    ("기생충이랑 비슷한 영화 추천해줘", [], {"similar", "recommendation"}, {"title": "기생충"}),
+    ("인셉션 같은 영화 보고싶어", [], {"recommendation"}, {"title": "인셉션"}),
+    ("라라랜드처럼 감성적인 영화", [], set(), {"title": "라라랜드"}),
+    ("유사한 분위기의 영화 알려줘", [], {"similar", "recommendation"}, {}),
+    # 제목을 추출하지 못하는 유사 추천 (일반 단어인 '가족', '오늘', '사랑'도 카탈로그 제목)
+    ("가족이랑 볼 수 있는 비슷한 영화 추천해줘", [], {"similar", "recommendation"}, {"title": None}),
+    ("오늘 밤에 볼 비슷한 영화 추천해줘", [], {"similar", "recommendation"}, {"title": None}),
+    ("사랑에 관한 유사한 영화 알려줘", [], {"similar", "recommendation"}, {"title": None}),
+    ("비슷한 느낌\n영화 말고 드라마", [], set(), {}),
+    ("공포 영화는 빼고 추천해줘", [], {"retry", "recommendation"}, {"exclusion": "빼고 추천"}),
+    ("로맨스 제외하고 다시", [], {"retry"}, {"exclusion": "제외하고"}),
+    ("다른 영화 없어?", [], {"retry"}, {}),
+    ("다시 추천해줘", [], {"retry", "recommendation"}, {}),
+    ("송강호가 출연한 영화 추천해줘", [], {"movie_info", "recommendation"}, {"credit": "송강호"}),
+    ("봉준호 감독 영화 알려줘", [], {"movie_info", "recommendation"}, {"credit": "봉준호"}),
+    ("마동석 나오는 영화", [], set(), {"credit": "마동석"}),
+    ("줄거리가 슬픈 영화", [], {"movie_info"}, {"credit": ""}),
+    ("안녕 사만다", [], set(), {}),
+    ("", [], set(), {}),
+]
+
+# 무작위 조합용 조각
+FRAGMENTS = [
+    "이 중에", "여기서", "영화 중에", "밀정", "살인의 추억", "기생충", "같은", "이랑", "처럼", "비슷한", "유사한",
+    "영화", "추천해줘", "볼만한", "보고싶어", "빼고", "제외", "뺀", "재추천", "다시 추천", "다른 영화", "배우",
+    "감독", "출연", "나오는", "줄거리", "내용", "완료", "송강호가", "무서운", "\n", " ", "알려줘", "해줘",
+]
+
+SIMILAR_TITLE = [
+    r'(.+?)(?:이랑|랑|과|와|같은|처럼.*?)\s*비슷한\s*영화',
+    r'(.+?)\s*같은\s*영화',
+    r'(.+?)\s*처럼\s*\S+\s*영화',
+]
+CREDIT = r"(.*?)(이|가)?\s*(출연|감독|제작|나오는|줄거리|내용).*?(영화)?(추천해줘|알려줘)?"
+
+
+def reference(text: str, previous_titles):
+    """기존 함수와 정규식으로 계산한 (의도, 재추천 방식, 추출 항목)"""
+    intents = set()
+    if "완료" in text:
+        intents.add("complete")
+    if is_follow_up_question(text, previous_titles):
+        intents.add("follow_up")
+    if is_similar_recommendation(text):
+        intents.add("similar")
+    is_retry, retry_mode = is_retry_request(text)
+    if is_retry:
+        intents.add("retry")
+    if is_recommendation_request(text):
+        intents.add("recommendation")
+    if is_movie_info_related(text):
+        intents.add("movie_info")
+
+    extracted = {}
+    for pattern in SIMILAR_TITLE:
+        match = re.search(pattern, text)
+        if match:
+            extracted["title"] = match.group(1).strip()
+            break
+    match = re.search(CREDIT, text)
+    if match:
+        extracted["credit"] = match.group(1).strip()
+    return intents, retry_mode, extracted
+
+
+def routed(text: str, previous_titles):
+    route = route_query(text, previous_titles)
+    extracted = {name: route.extract(name) for name in ("title", "credit") if route.extract(name) is not None}
+    return route.intents, route.retry_mode, extracted
+
+
+def check_golden() -> int:
+    failures = 0
+    for text, previous_titles, intents, expected in GOLDEN:
+        route = route_query(text, previous_titles)
+        extracted = {name: route.extract(name) for name in expected}
+        if route.intents != intents or extracted != expected:
+            print(f"GOLDEN FAIL {text!r}: {route}")
+            failures += 1
+        if routed(text, previous_titles) != reference(text, previous_titles):
+            print(f"PARITY FAIL {text!r}: {routed(text, previous_titles)} != {reference(text, previous_titles)}")
+            failures += 1
+    return failures
+
+
+def check_random(count: int, seed: int = 0) -> int:
+    rng = random.Random(seed)
+    failures = 0
+    for _ in range(count):
+        text = "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 8)))
+        previous_titles = rng.sample(PREVIOUS, rng.randint(0, len(PREVIOUS)))
+        if routed(text, previous_titles) != reference(text, previous_titles):
+            if failures < 10:
+                print(f"PARITY FAIL {text!r}: {routed(text, previous_titles)} != {reference(text, previous_titles)}")
+            failures += 1
+    return failures
+
+
+def measure(fn, queries, repeat: int) -> float:
+    start = time.perf_counter()
+    for i in range(repeat):
+        text, previous_titles = queries[i % len(queries)]
+        fn(text, previous_titles)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--random", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--catalog", action="store_true", help="카탈로그를 로드해 전체 제목 오토마톤으로 검사")
+    args = parser.parse_args()
+    if args.catalog:
+        from data_loader import get_dataframe
+        get_catalog_index() or get_dataframe()
+        get_catalog_index().title_spotter()
+
+    golden_failures = check_golden()
+    random_failures = check_random(args.random)
+    print(f"golden: {len(GOLDEN) * 2 - golden_failures}/{len(GOLDEN) * 2} checks passed")
+    print(f"random: {args.random - random_failures}/{args.random} queries agree")
+
+    queries = [(text, previous_titles) for text, previous_titles, _, _ in GOLDEN]
+    print(f"\nper query ({args.repeat} calls)")
+    print(f"{'utils functions + regexes':<28} {measure(reference, queries, args.repeat):>8.1f} us")
+    print(f"{'intent_router.route_query':<28} {measure(route_query, queries, args.repeat):>8.1f} us")
+    if golden_failures or random_failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
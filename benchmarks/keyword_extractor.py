@@ -0,0 +1,49 @@
+"""
+Probes for the local keyword fast path in recommender.extract_user_meta.
+
+Checks which queries are answered by the local extractor and which go to the
+LLM. One-character vocabulary terms such as '새' ("새 영화" = a new movie)
+must never be extracted locally, and a local result is only used when it has
+enough keywords for the similarity ranker (handle_recommendation). Run from
+anywhere:
+
+    python benchmarks/keyword_extractor.py
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from recommender import get_local_extractor, local_user_meta
+
+# (입력, 로컬 추출 결과를 그대로 쓰는지, 추출되면 안 되는 키워드)
+PROBES = [
+    ("새 영화 추천해줘", False, {"새"}),
+    ("봄 영화 추천해줘", False, {"봄"}),
+    ("새로운 스타일의 영화", False, {"새"}),
+    ("무서운 영화 추천해줘", False, set()),
+    ("신나는 액션 영화 추천", False, set()),
+    ("무섭고 잔인한 공포 슬래셔 스릴러 영화 추천해줘", True, set()),
+    ("신나는 액션 어드벤처 블록버스터 SF 영화", True, set()),
+]
+
+
+def main():
+    extractor = get_local_extractor()
+    failures = 0
+    for query, expected_local, forbidden in PROBES:
+        user_meta, confidence = extractor.extract(query)
+        terms = {term for values in user_meta.values() for term in values}
+        is_local = local_user_meta(query) is not None
+        if is_local != expected_local or terms & forbidden:
+            print(f"PROBE FAIL {query!r}: local={is_local}, confidence={confidence:.2f}, terms={sorted(terms)}")
+            failures += 1
+    print(f"probes: {len(PROBES) - failures}/{len(PROBES)} passed")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Ranking benchmark for the recommend_* top-k step.
+
+Compares the previous full sort (`sort_values(by="score").head(k)`) with the
+argpartition top-k in ranking.py, using both the dense posting-list scores and
+the MaxScore-pruned walk, on the catalog and on a catalog replicated to a
+larger size. Run from the project root (needs the Excel catalog or its
+snapshot under .cache/):
+
+    python benchmarks/ranking.py [--queries 200] [--scale 1 10 60]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from catalog_index import CatalogIndex
+from config import keyword_columns
+from data_loader import get_dataframe
+from ranking import dense_top_k, max_score_top_k
+
+
+def sample_queries(index: CatalogIndex, count: int, seed: int = 0) -> list:
+    """extract_user_meta 결과와 비슷한 크기(카테고리 1~4개, 카테고리당 키워드 1~5개)의 질의"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        user_meta = {}
+        for category in rng.sample(keyword_columns, rng.randint(1, 4)):
+            tokens = sorted(token for token in index.token_postings(category) if token)
+            user_meta[category] = rng.sample(tokens, min(len(tokens), rng.randint(1, 5)))
+        queries.append(user_meta)
+    return queries
+
+
+def full_sort(df: pd.DataFrame, index: CatalogIndex, user_meta: dict, k: int):
+    scored = df.assign(score=index.score(user_meta))
+    return scored[scored["score"] > 0].sort_values(by="score", ascending=False).head(k)
+
+
+def measure(fn, queries) -> float:
+    timings = []
+    for user_meta in queries:
+        start = time.perf_counter()
+        fn(user_meta)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 60])
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    catalog = get_dataframe()
+    for scale in args.scale:
+        df = pd.concat([catalog] * scale, ignore_index=True)
+        index = CatalogIndex(df)
+        allowed = np.ones(index.size, dtype=bool)
+        queries = sample_queries(index, args.queries)
+
+        # 두 방식의 결과가 같은지 먼저 확인
+        for user_meta in queries:
+            dense_rows, dense_scores = dense_top_k(index, user_meta, args.k, allowed)
+            pruned_rows, pruned_scores = max_score_top_k(index, user_meta, args.k, allowed)
+            assert np.array_equal(dense_rows, pruned_rows) and np.array_equal(dense_scores, pruned_scores)
+
+        print(f"\n## {index.size:,} rows, {len(queries)} queries, k={args.k}")
+        for name, fn in [
+            ("sort_values + head", lambda m: full_sort(df, index, m, args.k)),
+            ("dense top-k", lambda m: dense_top_k(index, m, args.k, allowed)),
+            ("MaxScore top-k", lambda m: max_score_top_k(index, m, args.k, allowed)),
+        ]:
+            print(f"{name:<20} median {measure(fn, queries):>8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
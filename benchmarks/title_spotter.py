@@ -0,0 +1,152 @@
+"""
+Title spotting benchmark for title_index.TitleSpotter.
+
+Puts catalog titles (as typed: with or without edition markers and spaces)
+into template sentences, checks that the spotter finds the inserted title
+with the right span, and that the catalog-wide spotter finds the same
+previously recommended titles as one built from the short list alone. Then
+compares its time per query with scanning every title key against the folded
+query, with the catalog also padded with synthetic titles to show how each
+approach grows with catalog size. Run from the project root (needs the Excel
+catalog or its snapshot under .cache/):
+
+    python benchmarks/title_spotter.py [--queries 500] [--scale 1 10]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_loader import get_dataframe
+from intent_router import extract_similar_title
+from recommender import spot_catalog_title
+from title_index import TitleSpotter, _subtitle_separator, _year_suffix, canonical_title, find_titles, strip_edition_markers
+
+TEMPLATES = [
+    "{}랑 비슷한 영화 추천해줘",
+    "어제 {} 봤는데 그거 같은 영화 있어?",
+    "{} 완료",
+    "혹시 {}는 몇 분짜리야",
+    "주말에 {}처럼 재밌는 영화 보고싶어",
+]
+
+# 유사 추천의 기준 영화 (입력, 기대 키). 제목 구간을 추출하지 못하면 일반 단어가 제목이어도 None
+SIMILAR_GOLDEN = [
+    ("어제 본 밀정 진짜 재밌던데 그거랑 비슷한 영화 추천해줘", "밀정"),
+    ("더빙 겨울왕국 2 같은 영화", "겨울왕국2"),
+    ("가족이랑 볼 수 있는 비슷한 영화 추천해줘", None),
+    ("오늘 밤에 볼 비슷한 영화 추천해줘", None),
+    ("사랑에 관한 유사한 영화 알려줘", None),
+]
+
+
+def typed_variants(title: str, rng: random.Random) -> str:
+    """사용자가 입력할 법한 형태: 판본 표기 제거, 띄어쓰기 제거 등"""
+    choice = rng.randint(0, 2)
+    if choice == 0:
+        return title
+    if choice == 1:
+        return strip_edition_markers(title)
+    return strip_edition_markers(title).replace(" ", "")
+
+
+def sample_queries(titles: list, count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        title = rng.choice(titles)
+        typed = typed_variants(title, rng)
+        template = rng.choice(TEMPLATES)
+        # 구간은 앞뒤 괄호/구두점을 뺀 부분 ("(더빙) 코코" → "더빙) 코코")
+        start = template.index("{}")
+        kept = [i for i, ch in enumerate(typed) if canonical_title(ch)]
+        queries.append((template.format(typed), start + kept[0], start + kept[-1] + 1, canonical_title(title)))
+    return queries
+
+
+def previous_title_parity(titles: list, spotter: TitleSpotter, count: int, seed: int = 0) -> int:
+    """
+    이전 추천 목록(5편) 중 하나를 본제목/연도 없는 제목 등으로 언급한 질의에서
+    카탈로그 전체 spotter와 목록만으로 만든 spotter가 같은 제목을 찾는지 확인
+    """
+    rng = random.Random(seed)
+    failures = 0
+    for _ in range(count):
+        previous = rng.sample(titles, 5)
+        stripped = strip_edition_markers(rng.choice(previous))
+        typed = rng.choice([stripped, _subtitle_separator.split(stripped, 1)[0], _year_suffix.sub("", stripped)])
+        text = rng.choice(TEMPLATES).format(typed) + " " + rng.choice(titles)
+        # 구간은 판본 표기까지 포함하는지에 따라 다를 수 있으므로 찾은 키로 비교
+        catalog_keys = [key for _, _, key in find_titles(text, previous, spotter)]
+        list_keys = [key for _, _, key in find_titles(text, previous)]
+        if catalog_keys != list_keys:
+            if failures < 10:
+                print(f"PARITY FAIL {text!r} {previous}: {catalog_keys} != {list_keys}")
+            failures += 1
+    return failures
+
+
+def scan_all(keys: list, text: str) -> list:
+    """모든 제목 키를 접은 입력과 비교하는 방식 (카탈로그 크기에 비례)"""
+    folded = canonical_title(text)
+    return [key for key in keys if key in folded]
+
+
+def measure(fn, queries) -> float:
+    start = time.perf_counter()
+    for text, _, _, _ in queries:
+        fn(text)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--verbose", action="store_true", help="찾지 못한 질의 출력")
+    args = parser.parse_args()
+
+    titles = [str(title) for title in get_dataframe()["title"].unique().tolist()]
+    queries = sample_queries([title for title in titles if len(canonical_title(title)) >= 2], args.queries)
+
+    spotter = TitleSpotter(titles)
+    found = 0
+    for text, start, end, key in queries:
+        if (start, end, key) in spotter.spot(text):
+            found += 1
+        elif args.verbose:
+            print(f"MISS {text!r}: {spotter.spot(text)}")
+    print(f"spotted {found}/{len(queries)} inserted titles with the exact span")
+
+    failures = 0
+    for text, expected in SIMILAR_GOLDEN:
+        mention = spot_catalog_title(text, extract_similar_title(text))
+        if (mention[2] if mention else None) != expected:
+            print(f"GOLDEN FAIL {text!r}: {mention} (expected {expected!r})")
+            failures += 1
+    print(f"similar-title golden: {len(SIMILAR_GOLDEN) - failures}/{len(SIMILAR_GOLDEN)} passed")
+
+    parity_failures = previous_title_parity(titles, spotter, args.queries)
+    print(f"previous-title parity: {args.queries - parity_failures}/{args.queries} queries agree")
+    failures += parity_failures
+
+    print(f"\n{'titles':>8} {'build ms':>9} {'spot us':>9} {'scan us':>9}")
+    for scale in args.scale:
+        padded = titles + [f"{title} 리마스터 {i}" for i in range(1, scale) for title in titles]
+        start = time.perf_counter()
+        padded_spotter = TitleSpotter(padded)
+        build_ms = (time.perf_counter() - start) * 1e3
+        keys = sorted(padded_spotter.keys)
+        print(f"{len(padded):>8} {build_ms:>9.1f} {measure(padded_spotter.spot, queries):>9.1f} "
+              f"{measure(lambda text: scan_all(keys, text), queries):>9.1f}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
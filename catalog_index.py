@@ -0,0 +1,279 @@
+"""
+Posting-list index over the movie catalog.
+
+The index is built once when the catalog is loaded and lets the recommenders
+score a `user_meta` dict without re-splitting every keyword column per movie.
+"""
+
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import keyword_columns, credit_columns
+from text_index import NgramIndex
+from title_index import TitleIndex, TitleSpotter
+
+
+# 이 문자가 없으면 정규식 패턴이 일반 문자열 검색과 같음
+regex_special_chars = set(".^$*+?{}[]\\|()")
+
+
+def split_keywords(value) -> set:
+    """콤마로 구분된 메타 필드를 get_content_score와 동일한 방식으로 토큰화"""
+    return set(k.strip() for k in str(value).split(","))
+
+
+class CatalogIndex:
+    """
+    카탈로그 DataFrame 위에 (컬럼, 키워드) → 행 위치(posting list) 인덱스를 구성합니다.
+    행 위치는 카탈로그 DataFrame의 0부터 시작하는 순서(position)입니다.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns=keyword_columns + credit_columns):
+        self.df = df
+        self.size = len(df)
+        self._labels = df.index if df.index.is_unique else None
+        self._titles = df["title"].to_numpy() if "title" in df.columns else None
+        self._token_postings = {}
+        self._title_postings = None
+        self._value_postings = {}
+        self._numeric_columns = {}
+        self._sorted_columns = {}
+        self._contains_cache = {}
+        self._text_indexes = {}
+        self._text_index_lock = threading.Lock()
+        self._title_index = None
+        self._title_spotter = None
+        self._search_texts = None
+        self._descending_orders = {}
+        for column in columns:
+            self.token_postings(column)
+
+    def token_postings(self, column: str) -> dict:
+        """컬럼의 키워드 → 행 위치 배열. 처음 요청될 때 한 번만 만듭니다."""
+        postings = self._token_postings.get(column)
+        if postings is not None:
+            return postings
+
+        if column in self.df.columns:
+            buckets = {}
+            for pos, value in enumerate(self.df[column].tolist()):
+                for token in split_keywords(value):
+                    buckets.setdefault(token, []).append(pos)
+            postings = {token: np.asarray(rows, dtype=np.int32) for token, rows in buckets.items()}
+        else:
+            # row.get(column, "")이 ""를 돌려주므로 모든 행이 빈 키워드 하나만 가진 것과 같음
+            postings = {"": np.arange(self.size, dtype=np.int32)}
+
+        self._token_postings[column] = postings
+        return postings
+
+    def title_postings(self) -> dict:
+        """제목 → 행 위치 배열 (국가별로 같은 제목이 여러 행일 수 있음)"""
+        if self._title_postings is None:
+            buckets = {}
+            if self._titles is not None:
+                for pos, title in enumerate(self._titles.tolist()):
+                    buckets.setdefault(title, []).append(pos)
+            self._title_postings = {title: np.asarray(rows, dtype=np.int32) for title, rows in buckets.items()}
+        return self._title_postings
+
+    def title_mask(self, titles) -> np.ndarray:
+        """titles 중 하나와 제목이 같은 카탈로그 행을 True로 표시한 bool 배열"""
+        mask = np.zeros(self.size, dtype=bool)
+        postings = self.title_postings()
+        for title in titles:
+            rows = postings.get(title)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def token_mask(self, items) -> np.ndarray:
+        """
+        (컬럼, 값) 목록 중 하나라도 해당 컬럼의 토큰으로 가진 행을 True로 표시합니다.
+        부분 문자열이 아니라 콤마로 구분된 토큰 단위로 비교하며, 전체 목록을 한 번에 반영합니다.
+        """
+        mask = np.zeros(self.size, dtype=bool)
+        rows = []
+        for column, value in items:
+            if column not in self.df.columns:
+                continue
+            postings = self.token_postings(column).get(str(value).strip())
+            if postings is not None:
+                rows.append(postings)
+        if rows:
+            mask[np.concatenate(rows)] = True
+        return mask
+
+    def value_postings(self, column: str) -> dict:
+        """컬럼의 값(원래 값 그대로) → 행 위치 배열. 범주형 코드(factorize)로 한 번에 만듭니다."""
+        postings = self._value_postings.get(column)
+        if postings is None:
+            # NaN도 하나의 값으로 포함 (astype(str)에서 "nan"으로 검색되므로)
+            codes, uniques = pd.factorize(self.df[column], use_na_sentinel=False)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            postings = {
+                value: order[bounds[code]:bounds[code + 1]].astype(np.int32)
+                for code, value in enumerate(uniques.tolist())
+            }
+            self._value_postings[column] = postings
+        return postings
+
+    def equals_mask(self, column: str, value) -> np.ndarray:
+        """df[column] == value 와 같은 bool 마스크"""
+        mask = np.zeros(self.size, dtype=bool)
+        if pd.isna(value):
+            return mask
+        rows = self.value_postings(column).get(value)
+        if rows is not None:
+            mask[rows] = True
+        return mask
+
+    def numeric_values(self, column: str) -> np.ndarray:
+        """pd.to_numeric으로 변환한 컬럼 값 (변환할 수 없으면 NaN)"""
+        values = self._numeric_columns.get(column)
+        if values is None:
+            values = self._numeric_columns[column] = pd.to_numeric(self.df[column], errors="coerce").to_numpy(dtype=float)
+        return values
+
+    def sorted_column(self, column: str):
+        """숫자로 변환한 컬럼의 (정렬 순서, 정렬된 값). NaN은 맨 뒤에 위치"""
+        cached = self._sorted_columns.get(column)
+        if cached is None:
+            values = self.numeric_values(column)
+            order = np.argsort(values, kind="stable")
+            cached = self._sorted_columns[column] = (order, values[order])
+        return cached
+
+    def at_most_mask(self, column: str, value) -> np.ndarray:
+        """pd.to_numeric(df[column]) <= value 와 같은 bool 마스크 (이진 탐색)"""
+        order, sorted_values = self.sorted_column(column)
+        mask = np.zeros(self.size, dtype=bool)
+        mask[order[:np.searchsorted(sorted_values, value, side="right")]] = True
+        return mask
+
+    def contains_mask(self, column: str, pattern: str) -> np.ndarray:
+        """
+        df[column].astype(str).str.contains(pattern) 와 같은 bool 마스크.
+        콤마와 앞뒤 공백이 없는 일반 문자열은 토큰 목록에서, 그 외(정규식 등)는 고유 값에서 찾습니다.
+        """
+        key = (column, pattern)
+        mask = self._contains_cache.get(key)
+        if mask is not None:
+            return mask
+
+        mask = np.zeros(self.size, dtype=bool)
+        literal = not any(ch in pattern for ch in regex_special_chars)
+        if literal and "," not in pattern and pattern == pattern.strip():
+            # 콤마가 없는 문자열이 나타나는 위치는 항상 하나의 토큰 안쪽
+            for token, rows in self.token_postings(column).items():
+                if pattern in token:
+                    mask[rows] = True
+        else:
+            regex = re.compile(pattern)
+            for value, rows in self.value_postings(column).items():
+                if regex.search(str(value)):
+                    mask[rows] = True
+
+        if len(self._contains_cache) >= 256:
+            self._contains_cache.clear()
+        self._contains_cache[key] = mask
+        return mask
+
+    def text_index(self, columns) -> NgramIndex:
+        """columns의 값(str)을 필드로 하는 글자 bigram 인덱스. 처음 요청될 때 한 번만 만듭니다."""
+        columns = tuple(columns)
+        index = self._text_indexes.get(columns)
+        if index is None:
+            # 백그라운드 예열과 첫 검색이 겹쳐도 한 번만 생성
+            with self._text_index_lock:
+                index = self._text_indexes.get(columns)
+                if index is None:
+                    rows = zip(*(self.df[column].tolist() for column in columns))
+                    index = self._text_indexes[columns] = NgramIndex(
+                        (tuple(str(value) for value in row) for row in rows), n=2
+                    )
+        return index
+
+    def title_index(self) -> TitleIndex:
+        """정규화된 제목 키 인덱스 (접두사/오타 검색용). 처음 요청될 때 한 번만 만듭니다."""
+        if self._title_index is None:
+            with self._text_index_lock:
+                if self._title_index is None:
+                    titles = self._titles.tolist() if self._titles is not None else []
+                    self._title_index = TitleIndex(titles)
+        return self._title_index
+
+    def title_spotter(self) -> TitleSpotter:
+        """문장 속 제목 언급을 찾는 오토마톤 (카탈로그 전체 제목). 처음 요청될 때 한 번만 만듭니다."""
+        if self._title_spotter is None:
+            with self._text_index_lock:
+                if self._title_spotter is None:
+                    titles = self._titles.tolist() if self._titles is not None else []
+                    self._title_spotter = TitleSpotter(titles)
+        return self._title_spotter
+
+    def text_contains_mask(self, columns, keyword: str) -> np.ndarray:
+        """columns 중 하나라도 keyword를 포함하는 행 (any(keyword in str(row[col])))"""
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.text_index(columns).search(keyword)] = True
+        return mask
+
+    def search_texts(self) -> list:
+        """영화별 검색용 텍스트 (document를 제외한 모든 컬럼 값을 줄바꿈으로 이어 붙임)"""
+        if self._search_texts is None:
+            columns = [column for column in self.df.columns if column != "document"]
+            rows = zip(*(self.df[column].tolist() for column in columns))
+            self._search_texts = ["\n".join(str(value) for value in row) for row in rows]
+        return self._search_texts
+
+    def descending_order(self, column: str) -> np.ndarray:
+        """숫자 컬럼의 내림차순 행 위치 (값이 같으면 카탈로그 순서, NaN은 맨 뒤)"""
+        order = self._descending_orders.get(column)
+        if order is None:
+            order = self._descending_orders[column] = np.argsort(-self.numeric_values(column), kind="stable")
+        return order
+
+    def score(self, user_meta: dict) -> np.ndarray:
+        """카탈로그 전체 행에 대한 get_content_score 값을 한 번에 계산"""
+        scores = np.zeros(self.size, dtype=np.int64)
+        for category, user_keywords in user_meta.items():
+            postings = self.token_postings(category)
+            for keyword in set(user_keywords):
+                rows = postings.get(keyword)
+                if rows is not None:
+                    scores[rows] += 1
+        return scores
+
+    def positions(self, frame: pd.DataFrame):
+        """
+        frame의 각 행이 카탈로그의 몇 번째 행인지 반환합니다.
+        카탈로그에서 잘라낸 DataFrame이 아니면 None을 반환합니다.
+        """
+        if self._labels is None:
+            return None
+        positions = self._labels.get_indexer(frame.index)
+        if (positions < 0).any():
+            return None
+        if self._titles is not None and "title" in frame.columns:
+            if not np.array_equal(self._titles[positions], frame["title"].to_numpy()):
+                return None
+        return positions
+
+
+_catalog_index = None
+
+
+def build_catalog_index(df: pd.DataFrame) -> CatalogIndex:
+    """카탈로그 로드 시 인덱스를 만들고 전역으로 등록"""
+    global _catalog_index
+    _catalog_index = CatalogIndex(df)
+    return _catalog_index
+
+
+def get_catalog_index():
+    """등록된 카탈로그 인덱스 (아직 없으면 None)"""
+    return _catalog_index
@@ -12,3 +12,18 @@ openai.api_key = os.environ.get("OPENAI_API_KEY", "")
 # Model names
 model_name = "gpt-4.1-mini"
 embedding_model_name = "text-embedding-3-small"
+
+# 임베딩 백엔드: "openai" 또는 네트워크 없이 동작하는 "local"
+embedding_backend = os.environ.get("EMBEDDING_BACKEND", "openai")
+
+# 메타 키워드 컬럼 (추천 점수 계산 및 키워드 인덱스 대상)
+keyword_columns = [
+    "Emotion", "Subject", "atmosphere", "background", "character_A", "character_B", "character_C",
+    "criminal", "family", "genre", "love", "natural_science", "religion", "social_culture", "style"
+]
+
+# 콤마로 구분된 출연/제작 정보 컬럼 (싫어요 필터용 토큰 인덱스 대상)
+credit_columns = ["director", "actor"]
+
+# 제작 정보 검색(부분 문자열) 대상 컬럼
+info_columns = ["actor", "director", "description", "cp_name"]
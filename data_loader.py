@@ -3,15 +3,28 @@
 Data loading and preprocessing utilities.
 """
 
+import hashlib
+import json
+import os
+import threading
 import pandas as pd
 from os import path
 from langchain.schema import Document
 
+from catalog_index import build_catalog_index
+from config import info_columns
+
 # ===== Excel settings (can be adjusted) =====
 excel_file = 'data/movie_data.xlsx'
 sheet_input = 'movie_meta_info_update_20250519'
 sheet_output = 'movie_combined_docu'
 
+# ===== 컴파일된 카탈로그 스냅샷 설정 =====
+snapshot_dir = '.cache/catalog'
+snapshot_version = 1
+# 엑셀에서는 빈 칸 때문에 문자열로 읽히는 숫자 컬럼
+numeric_columns = ['target_age', 'rating', 'running_time', 'viewers', 'viewtimes']
+
 def make_document(row):
     return f"""제목: "{row['title']}"
 감독/연출: "{row['director']}"
@@ -38,27 +51,120 @@ def make_document(row):
 - 영화 스타일: "{row['style']}"
 """
 
-df = pd.read_excel(excel_file, sheet_name=sheet_input).fillna('')
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def snapshot_paths(file_path: str, sheet: str):
+    """스냅샷 파일과 메타 정보(JSON) 파일 경로"""
+    base = path.join(snapshot_dir, f"{path.basename(file_path)}.{sheet}")
+    return base + '.pkl', base + '.json'
 
-# document 컬럼 생성
-df['document'] = df.apply(make_document, axis=1)
+def read_excel_catalog(file_path: str, sheet: str):
+    """엑셀을 읽어 document 텍스트와 숫자 컬럼 타입까지 정리한 DataFrame 생성"""
+    df = pd.read_excel(file_path, sheet_name=sheet).fillna('')
+    # 새 컬럼 'document' 생성 (숫자 변환 전에 만들어 원본 표기를 유지)
+    df["document"] = df.apply(make_document, axis=1)
+    for column in numeric_columns:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df
+
+def compile_catalog(file_path: str = excel_file, sheet: str = sheet_input):
+    """
+    엑셀 카탈로그를 타입이 정리된 컬럼형 스냅샷(pickle)으로 저장합니다.
+    원본 파일의 크기, 수정 시각, 해시를 함께 기록해 변경 여부를 판단합니다.
+    """
+    df = read_excel_catalog(file_path, sheet)
+    snapshot_file, meta_file = snapshot_paths(file_path, sheet)
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    stat = os.stat(file_path)
+    meta = {
+        "version": snapshot_version,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_sha256(file_path),
+    }
+    # 임시 파일에 쓴 뒤 교체해 중간에 끊겨도 깨진 스냅샷이 남지 않게 함
+    df.to_pickle(snapshot_file + '.tmp')
+    os.replace(snapshot_file + '.tmp', snapshot_file)
+    with open(meta_file + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(meta_file + '.tmp', meta_file)
+    print(f"✅ 카탈로그 스냅샷 생성: {snapshot_file}")
+    return df
+
+def load_snapshot(file_path: str = excel_file, sheet: str = sheet_input):
+    """원본 엑셀이 바뀌지 않았으면 스냅샷을 읽어 반환, 아니면 None"""
+    snapshot_file, meta_file = snapshot_paths(file_path, sheet)
+    if not (path.exists(snapshot_file) and path.exists(meta_file)):
+        return None
+    try:
+        with open(meta_file, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("version") != snapshot_version:
+            return None
+
+        stat = os.stat(file_path)
+        if (meta["size"], meta["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+            # 수정 시각만 바뀌고 내용이 같으면 스냅샷을 그대로 사용
+            if meta["size"] != stat.st_size or meta["sha256"] != file_sha256(file_path):
+                return None
+            meta["mtime_ns"] = stat.st_mtime_ns
+            with open(meta_file, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+
+        return pd.read_pickle(snapshot_file)
+    except Exception as e:
+        print("❗ 카탈로그 스냅샷 로드 실패, 엑셀에서 다시 읽습니다:", e)
+        return None
+
+def warm_catalog_index(index):
+    """처음 검색할 때 만들어지는 카탈로그 인덱스들을 미리 생성"""
+    index.title_index()
+    index.title_spotter()
+    index.text_index(info_columns)
 
 def load_dataframe(file_path: str = excel_file, sheet: str = sheet_input):
     """
     Load the movie metadata spreadsheet into a pandas DataFrame.
+    Uses the compiled snapshot unless the spreadsheet changed since it was written.
     """
     if not path.exists(file_path):
         raise FileNotFoundError(f"엑셀 파일을 찾을 수 없습니다: {file_path}")
-    df = pd.read_excel(file_path, sheet_name=sheet).fillna('')
-    # 새 컬럼 'document' 생성
-    df["document"] = df.apply(make_document, axis=1)
+    df = load_snapshot(file_path, sheet)
+    if df is None:
+        df = compile_catalog(file_path, sheet)
+    # 키워드 인덱스는 카탈로그 로드 시 한 번만 생성
+    index = build_catalog_index(df)
+    # 제목 인덱스와 제작 정보 검색용 bigram 인덱스는 만드는 데 시간이 걸리므로 백그라운드에서 미리 생성
+    threading.Thread(target=warm_catalog_index, args=(index,), daemon=True).start()
     return df
 
+_catalog_df = None
+_catalog_lock = threading.Lock()
+
+def get_dataframe():
+    """
+    프로세스 전체에서 공유하는 카탈로그 DataFrame.
+    처음 호출될 때 한 번만 로드합니다 (import 시점에는 아무 것도 읽지 않음).
+    """
+    global _catalog_df
+    if _catalog_df is None:
+        with _catalog_lock:
+            if _catalog_df is None:
+                _catalog_df = load_dataframe()
+    return _catalog_df
+
 def build_documents(df):
     """Convert dataframe rows into LangChain-compatible Document objects."""
     docs = [
-        Document(page_content=row['document'], metadata={"title": row['title']})
-        for _, row in df.iterrows()
+        Document(page_content=row['document'], metadata={"movie_id": int(idx), "title": row['title']})
+        for idx, row in df.iterrows()
     ]
 
     return docs
@@ -2,39 +2,247 @@
 SQLite helper functions for user interaction logging.
 """
 
+import atexit
+import json
+import queue
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from contextlib import contextmanager
 
+from user_profile import UserProfile, get_cached_profile, cache_profile
+
+default_db_path = "movie_recommendation.db"
+# 다른 세션이 쓰는 중일 때 바로 실패하지 않고 기다리는 시간
+busy_timeout_ms = 5000
+# 연결마다 재사용할 prepared statement 개수
+cached_statements = 128
+
+# 스키마 초기화가 끝난 DB 경로 (프로세스당 한 번만 init_db 실행)
+_initialized_dbs = set()
+_init_lock = threading.Lock()
+# 스레드별로 재사용하는 연결 ({db_path: connection})
+_local = threading.local()
+
+def connect(db_path=default_db_path):
+    """WAL 모드, synchronous=NORMAL, busy timeout이 설정된 새 연결"""
+    conn = sqlite3.connect(db_path, timeout=busy_timeout_ms / 1000, cached_statements=cached_statements)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+    return conn
+
+def get_connection(db_path=default_db_path):
+    """
+    현재 스레드가 재사용하는 연결을 반환합니다 (스레드·DB 경로별로 하나).
+    같은 연결을 계속 쓰므로 prepared statement 캐시도 함께 재사용됩니다.
+    """
+    ensure_db(db_path)
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = connect(db_path)
+    return conn
+
+def close_connection(db_path=default_db_path):
+    """현재 스레드의 재사용 연결을 닫음"""
+    conn = getattr(_local, "connections", {}).pop(db_path, None)
+    if conn is not None:
+        conn.close()
+
 @contextmanager
-def get_db(db_path="movie_recommendation.db"):
-    conn = sqlite3.connect(db_path, check_same_thread=False)
+def get_db(db_path=default_db_path):
+    """스레드별 재사용 연결을 빌려줌 (닫지 않음). 오류가 나면 열린 트랜잭션을 되돌립니다."""
+    conn = get_connection(db_path)
     try:
         yield conn
-    finally:
-        conn.close()
+    except Exception:
+        conn.rollback()
+        raise
 
-def init_db(db_path="movie_recommendation.db"):
-    with get_db() as conn:
-        cursor = conn.cursor()
-
-        cursor.executescript("""
-        -- 유저 정보
+def ensure_db(db_path=default_db_path):
+    """DB를 처음 사용할 때 한 번만 init_db를 실행 (import 시점에는 실행하지 않음)"""
+    if db_path in _initialized_dbs:
+        return
+    with _init_lock:
+        if db_path not in _initialized_dbs:
+            init_db(db_path)
+            _initialized_dbs.add(db_path)
+
+class EventWriter:
+    """
+    로그/피드백 INSERT를 모아서 쓰는 write-behind 큐.
+    submit()은 큐에 넣고 바로 Future를 반환하며, 백그라운드 스레드가 batch_size개가 모이거나
+    flush_interval초가 지나면 연속된 같은 SQL을 executemany로 묶어 한 트랜잭션으로 커밋합니다.
+    배치 커밋이 실패하면 이벤트를 하나씩 다시 기록하고, 그래도 실패한 이벤트의 Future에 예외를 남깁니다
+    (화면에 오류를 알려야 하는 호출자는 Future를 확인).
+    flush()는 그 시점까지 제출된 이벤트가 모두 커밋될 때까지 기다립니다 (read-your-writes).
+    """
+
+    def __init__(self, db_path=default_db_path, batch_size: int = 200, flush_interval: float = 0.2):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, sql: str, params: tuple) -> Future:
+        """이벤트를 큐에 넣고 커밋 결과(성공 시 True, 실패 시 예외)를 담을 Future를 반환"""
+        future = Future()
+        if self._closed:
+            # 종료 이후 들어온 이벤트는 바로 기록
+            self._write_one(sql, params, future)
+            return future
+        if self._thread is None:
+            self._start()
+        with self._lock:
+            self._pending += 1
+        self._queue.put((sql, params, future))
+        return future
+
+    def flush(self, timeout=None) -> bool:
+        """제출된 이벤트가 모두 커밋될 때까지 대기 (대기 중인 이벤트가 없으면 바로 반환)"""
+        if self._pending == 0 or self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """남은 이벤트를 모두 기록하고 스레드를 종료"""
+        if self._thread is None or self._closed:
+            self._closed = True
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, waiters = [], []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    # flush 요청: 지금까지 모은 것을 바로 기록
+                    waiters.append(item)
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            with get_db(self.db_path) as conn:
+                # 순서를 유지하면서 연속된 같은 SQL끼리 executemany
+                start = 0
+                while start < len(batch):
+                    sql = batch[start][0]
+                    stop = start
+                    while stop < len(batch) and batch[stop][0] == sql:
+                        stop += 1
+                    conn.executemany(sql, [params for _, params, _ in batch[start:stop]])
+                    start = stop
+                conn.commit()
+            for _, _, future in batch:
+                future.set_result(True)
+        except Exception as e:
+            # 한 이벤트 때문에 나머지가 버려지지 않도록 하나씩 다시 기록
+            print("❌ 이벤트 배치 저장 실패, 하나씩 다시 기록합니다:", e)
+            for sql, params, future in batch:
+                self._write_one(sql, params, future)
+        finally:
+            with self._lock:
+                self._pending -= len(batch)
+
+    def _write_one(self, sql: str, params: tuple, future: Future):
+        try:
+            with get_db(self.db_path) as conn:
+                conn.execute(sql, params)
+                conn.commit()
+        except Exception as e:
+            print("❌ 이벤트 저장 실패:", e)
+            future.set_exception(e)
+        else:
+            future.set_result(True)
+
+
+_event_writers = {}
+_event_writers_lock = threading.Lock()
+
+def get_event_writer(db_path=default_db_path) -> EventWriter:
+    """DB 경로별로 하나씩 공유하는 write-behind 큐"""
+    writer = _event_writers.get(db_path)
+    if writer is None:
+        with _event_writers_lock:
+            writer = _event_writers.get(db_path)
+            if writer is None:
+                writer = _event_writers[db_path] = EventWriter(db_path)
+    return writer
+
+def flush_events(db_path=default_db_path):
+    """아직 기록되지 않은 로그/피드백을 커밋 (조회 전에 호출해 자신의 쓰기를 읽도록 보장)"""
+    writer = _event_writers.get(db_path)
+    if writer is not None:
+        writer.flush()
+
+@atexit.register
+def _close_event_writers():
+    for writer in list(_event_writers.values()):
+        writer.close()
+
+# 순서대로 적용되는 스키마 마이그레이션: (버전, 설명, SQL 문 목록)
+# 이미 배포된 마이그레이션은 수정하지 말고 새 버전을 추가하세요.
+migrations = [
+    (1, "기본 테이블", [
+        # 유저 정보
+        """
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_name TEXT UNIQUE NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        -- 유저 입력 히스토리 (예: "무서운 영화 추천해줘")
+        )
+        """,
+        # 유저 입력 히스토리 (예: "무서운 영화 추천해줘")
+        """
         CREATE TABLE IF NOT EXISTS user_interactions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
             user_input TEXT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id)
-        );
-
-        -- 추천된 영화에 대한 유저의 선택/비선택 피드백
+        )
+        """,
+        # 추천된 영화에 대한 유저의 선택/비선택 피드백
+        """
         CREATE TABLE IF NOT EXISTS user_feedback (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             interaction_id INTEGER NOT NULL,
@@ -44,9 +252,10 @@ def init_db(db_path="movie_recommendation.db"):
             feedback_text TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (interaction_id) REFERENCES user_interactions(id)
-        );
-
-        -- 배우/장르/스타일 등 싫어하는 요소 저장
+        )
+        """,
+        # 배우/장르/스타일 등 싫어하는 요소 저장
+        """
         CREATE TABLE IF NOT EXISTS user_dislikes (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
@@ -54,27 +263,96 @@ def init_db(db_path="movie_recommendation.db"):
             value TEXT NOT NULL,     -- 예: 류승룡, 공포, 곡성
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id)
-        );
-
-        -- 실제 추천된 영화 로그 저장 (재추천 방지 등)
+        )
+        """,
+        # 실제 추천된 영화 로그 저장 (재추천 방지 등)
+        """
         CREATE TABLE IF NOT EXISTS recommendation_logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             interaction_id INTEGER NOT NULL,
             movie_title TEXT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (interaction_id) REFERENCES user_interactions(id)
-        );
-        """)
+        )
+        """,
+    ]),
+    (2, "GPT 키워드 추출 캐시", [
+        # 정규화된 사용자 입력별 GPT 키워드 추출 결과 캐시
+        """
+        CREATE TABLE IF NOT EXISTS user_meta_cache (
+            query_key TEXT NOT NULL,
+            namespace TEXT NOT NULL,  -- 모델/프롬프트 해시 (프롬프트가 바뀌면 캐시 무효화)
+            user_meta TEXT NOT NULL,  -- JSON
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (query_key, namespace)
+        )
+        """,
+    ]),
+    (3, "유저별 조회 인덱스", [
+        # get_previous_recommendations / get_feedback_by_user_id: user_id → interaction 목록
+        "CREATE INDEX IF NOT EXISTS idx_user_interactions_user ON user_interactions (user_id, id)",
+        # interaction → 추천 로그 / 피드백
+        "CREATE INDEX IF NOT EXISTS idx_recommendation_logs_interaction ON recommendation_logs (interaction_id, movie_title)",
+        "CREATE INDEX IF NOT EXISTS idx_user_feedback_interaction ON user_feedback (interaction_id)",
+        # get_user_dislikes / show_user_dislikes
+        "CREATE INDEX IF NOT EXISTS idx_user_dislikes_user ON user_dislikes (user_id, category, value)",
+    ]),
+]
+
+def get_schema_version(conn) -> int:
+    """적용된 마지막 마이그레이션 버전 (schema_version 테이블이 없으면 0)"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+def migrate(conn, target_version=None) -> int:
+    """
+    아직 적용되지 않은 마이그레이션을 순서대로 적용하고 최종 버전을 반환합니다.
+    각 마이그레이션은 BEGIN IMMEDIATE 트랜잭션 안에서 실행되므로
+    여러 프로세스가 동시에 시작해도 한 번만 적용됩니다.
+    """
+    if target_version is None:
+        target_version = migrations[-1][0]
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+    for version, description, statements in migrations:
+        if version > target_version:
+            break
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return get_schema_version(conn)
 
-        conn.commit()
+def init_db(db_path=default_db_path):
+    conn = connect(db_path)
+    try:
+        version = migrate(conn)
+    finally:
         conn.close()
-    print("✅ 데이터베이스 초기화 완료 (5개 테이블 생성됨)")
+    print(f"✅ 데이터베이스 초기화 완료 (스키마 버전 {version})")
 
 
 
 
-def get_or_create_user_id(user_name: str, db_path: str = "movie_recommendation.db") -> int:
-    with get_db() as conn:
+def get_or_create_user_id(user_name: str, db_path: str = default_db_path) -> int:
+    with get_db(db_path) as conn:
         cursor = conn.cursor()
 
         # 1. user_name 존재하는지 확인
@@ -82,97 +360,105 @@ def get_or_create_user_id(user_name: str, db_path: str = "movie_recommendation.d
         row = cursor.fetchone()
 
         if row:
-            user_id = row[0]
-        else:
-            # 2. 없으면 새로 생성
-            cursor.execute("INSERT INTO users (user_name) VALUES (?)", (user_name,))
-            conn.commit()
-            user_id = cursor.lastrowid
-
-        conn.close()
-        return user_id
+            return row[0]
 
-def create_interaction(user_id: int, user_input: str, db_path: str = "movie_recommendation.db") -> int:
-    """사용자 입력 저장 후 interaction_id 반환"""
-    with get_db() as conn:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(
+        # 2. 없으면 새로 생성
+        cursor.execute("INSERT INTO users (user_name) VALUES (?)", (user_name,))
+        conn.commit()
+        return cursor.lastrowid
+
+def create_interaction(user_id: int, user_input: str, db_path: str = default_db_path) -> int:
+    """
+    사용자 입력 저장 후 interaction_id 반환.
+    호출한 쪽이 새 id(AUTOINCREMENT)를 바로 써야 하므로 큐를 거치지 않고 커밋합니다.
+    """
+    with get_db(db_path) as conn:
+        cursor = conn.execute(
             "INSERT INTO user_interactions (user_id, user_input) VALUES (?, ?)",
             (user_id, user_input)
         )
         conn.commit()
         interaction_id = cursor.lastrowid
-        conn.close()
-        return interaction_id
-
-def log_recommendations(interaction_id: int, titles: list[str], db_path: str = "movie_recommendation.db"):
-    """추천 영화 목록 recommendation_logs 테이블에 저장"""
-    with get_db() as conn:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        for title in titles:
-            cursor.execute(
-                "INSERT INTO recommendation_logs (interaction_id, movie_title) VALUES (?, ?)",
-                (interaction_id, title)
-            )
-        conn.commit()
-        conn.close()
-
-def get_previous_recommendations(user_id: int, db_path: str = "movie_recommendation.db") -> list:
+    remember_interaction_user(interaction_id, user_id)
+    return interaction_id
+
+# 최근 interaction_id → user_id (추천 로그로 프로필을 갱신할 때 사용)
+_interaction_users = OrderedDict()
+_interaction_users_lock = threading.Lock()
+
+def remember_interaction_user(interaction_id: int, user_id: int, capacity: int = 4096):
+    with _interaction_users_lock:
+        _interaction_users[interaction_id] = user_id
+        while len(_interaction_users) > capacity:
+            _interaction_users.popitem(last=False)
+
+def get_interaction_user(interaction_id: int, db_path: str = default_db_path):
+    """interaction의 user_id (최근 것은 메모리에서, 아니면 DB에서 조회)"""
+    with _interaction_users_lock:
+        user_id = _interaction_users.get(interaction_id)
+    if user_id is not None:
+        return user_id
+    with get_db(db_path) as conn:
+        row = conn.execute("SELECT user_id FROM user_interactions WHERE id = ?", (interaction_id,)).fetchone()
+    return row[0] if row else None
+
+def log_recommendations(interaction_id: int, titles: list[str], db_path: str = default_db_path):
+    """추천 영화 목록 recommendation_logs 테이블에 저장 (write-behind 큐에 넣고 바로 반환)"""
+    writer = get_event_writer(db_path)
+    for title in titles:
+        writer.submit("INSERT INTO recommendation_logs (interaction_id, movie_title) VALUES (?, ?)", (interaction_id, title))
+
+    # 메모리에 있는 사용자 프로필도 함께 갱신
+    user_id = get_interaction_user(interaction_id, db_path)
+    profile = get_cached_profile(db_path, user_id) if user_id is not None else None
+    if profile is not None:
+        profile.add_recommendations(titles)
+
+def get_previous_recommendations(user_id: int, db_path: str = default_db_path) -> list:
     """해당 유저의 과거 추천된 영화 목록 반환"""
-    with get_db() as conn:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
+    flush_events(db_path)
+    with get_db(db_path) as conn:
+        return conn.execute("""
             select rl.movie_title, ui.created_at
             from recommendation_logs rl
             inner join user_interactions ui
                 on rl.interaction_id = ui.id
             where ui.user_id = ?
-        """, (user_id,))
-        titles = cursor.fetchall()
-        conn.close()
-    return titles
-
-def save_feedback(interaction_id: int, movie_title: str, is_selected: bool, is_disliked: bool, feedback_text: str = "", db_path: str = "movie_recommendation.db"):
-    """유저의 피드백 (선택 or 싫어요 등) 저장"""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO user_feedback (interaction_id, movie_title, is_selected, is_disliked, feedback_text)
-            VALUES (?, ?, ?, ?, ?)
-        """, (interaction_id, movie_title, is_selected, is_disliked, feedback_text))
-        conn.commit()
-        conn.close()
-
-def add_user_dislike(user_id: int, category: str, value: str, db_path: str = "movie_recommendation.db"):
-    """사용자가 싫어하는 요소 (배우, 장르 등) 저장"""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO user_dislikes (user_id, category, value)
-            VALUES (?, ?, ?)
-        """, (user_id, category, value))
-        conn.commit()
-        conn.close()
-
-def get_user_dislikes(user_id: int, db_path: str = "movie_recommendation.db") -> list[tuple[str, str]]:
+        """, (user_id,)).fetchall()
+
+def save_feedback(interaction_id: int, movie_title: str, is_selected: bool, is_disliked: bool, feedback_text: str = "", db_path: str = default_db_path) -> Future:
+    """유저의 피드백 (선택 or 싫어요 등) 저장 (write-behind 큐에 넣고 커밋 결과를 담을 Future 반환)"""
+    return get_event_writer(db_path).submit("""
+        INSERT INTO user_feedback (interaction_id, movie_title, is_selected, is_disliked, feedback_text)
+        VALUES (?, ?, ?, ?, ?)
+    """, (interaction_id, movie_title, is_selected, is_disliked, feedback_text))
+
+def add_user_dislike(user_id: int, category: str, value: str, db_path: str = default_db_path) -> Future:
+    """사용자가 싫어하는 요소 (배우, 장르 등) 저장 (write-behind 큐에 넣고 커밋 결과를 담을 Future 반환)"""
+    future = get_event_writer(db_path).submit("""
+        INSERT INTO user_dislikes (user_id, category, value)
+        VALUES (?, ?, ?)
+    """, (user_id, category, value))
+
+    profile = get_cached_profile(db_path, user_id)
+    if profile is not None:
+        profile.add_dislike(category, value)
+    return future
+
+def get_user_dislikes(user_id: int, db_path: str = default_db_path) -> list[tuple[str, str]]:
     """해당 유저가 저장한 싫어하는 요소 목록 반환"""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
+    flush_events(db_path)
+    with get_db(db_path) as conn:
+        return conn.execute("""
             SELECT category, value
             FROM user_dislikes
             WHERE user_id = ?
-        """, (user_id,))
-        dislikes = cursor.fetchall()
-        conn.close()
-        return dislikes
+        """, (user_id,)).fetchall()
 
-def show_user_dislikes(user_id: int, db_path: str = "movie_recommendation.db"):
+def show_user_dislikes(user_id: int, db_path: str = default_db_path):
     """특정 유저가 싫어한다고 표시한 요소들을 보기 좋게 출력"""
-    with get_db() as conn:
+    flush_events(db_path)
+    with get_db(db_path) as conn:
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -183,7 +469,6 @@ def show_user_dislikes(user_id: int, db_path: str = "movie_recommendation.db"):
         """, (user_id,))
 
         rows = cursor.fetchall()
-        conn.close()
 
     if not rows:
         print(f"⚠️ 사용자 ID {user_id}는 아직 싫어하는 요소를 등록하지 않았습니다.")
@@ -193,9 +478,10 @@ def show_user_dislikes(user_id: int, db_path: str = "movie_recommendation.db"):
     for i, (category, value, created_at) in enumerate(rows, 1):
         print(f"{i}. ❌ [{category}] {value} (등록 시점: {created_at})")
 
-def show_user_feedback(user_id: int, db_path: str = "movie_recommendation.db"):
+def show_user_feedback(user_id: int, db_path: str = default_db_path):
     """특정 유저의 피드백 기록만 보기 좋게 출력"""
-    with get_db() as conn:
+    flush_events(db_path)
+    with get_db(db_path) as conn:
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -209,7 +495,6 @@ def show_user_feedback(user_id: int, db_path: str = "movie_recommendation.db"):
         """, (user_id,))
 
         rows = cursor.fetchall()
-        conn.close()
 
         if not rows:
             print(f"⚠️ 사용자 ID {user_id}에 대한 피드백이 없습니다.")
@@ -227,9 +512,10 @@ def show_user_feedback(user_id: int, db_path: str = "movie_recommendation.db"):
             print(f"🕒 시간: {time}")
             print("-" * 50)
 
-def get_feedback_by_user_id(user_id: int, db_path: str = "movie_recommendation.db"):
+def get_feedback_by_user_id(user_id: int, db_path: str = default_db_path):
     """특정 유저의 피드백 기록만 보기 좋게 출력"""
-    with get_db() as conn:
+    flush_events(db_path)
+    with get_db(db_path) as conn:
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -243,27 +529,54 @@ def get_feedback_by_user_id(user_id: int, db_path: str = "movie_recommendation.d
         """, (user_id,))
 
         rows = cursor.fetchall()
-        conn.close()
 
         return rows
 
 
-def apply_user_filters(df, user_id, selected_title=None):
-    disliked_items = get_user_dislikes(user_id)
-    previous_titles = get_previous_recommendations(user_id)
-
-    if selected_title:
-        previous_titles.append(selected_title)
+def get_cached_user_meta(query_key: str, namespace: str, db_path: str = default_db_path):
+    """캐시된 키워드 추출 결과(dict) 반환, 없으면 None"""
+    with get_db(db_path) as conn:
+        row = conn.execute(
+            "SELECT user_meta FROM user_meta_cache WHERE query_key = ? AND namespace = ?",
+            (query_key, namespace)
+        ).fetchone()
+    return json.loads(row[0]) if row else None
+
+def save_cached_user_meta(query_key: str, namespace: str, user_meta: dict, db_path: str = default_db_path):
+    """키워드 추출 결과를 캐시에 저장"""
+    with get_db(db_path) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO user_meta_cache (query_key, namespace, user_meta) VALUES (?, ?, ?)",
+            (query_key, namespace, json.dumps(user_meta, ensure_ascii=False))
+        )
+        conn.commit()
 
-    disliked_titles = [value for cat, value in disliked_items if cat == "title"]
-    filtered_df = df[~df["title"].isin(previous_titles + disliked_titles)]
 
-    for category, value in disliked_items:
-        if category != "title" and category in filtered_df.columns:
-            col_series = filtered_df[category].fillna("").astype(str)
-            filtered_df = filtered_df[~col_series.str.contains(re.escape(value), na=False)]
+def get_user_profile(user_id: int, db_path: str = default_db_path) -> UserProfile:
+    """
+    사용자의 싫어요/이전 추천 프로필을 반환합니다.
+    처음 한 번만 DB에서 읽고, 이후에는 add_user_dislike / log_recommendations가 갱신한 메모리 값을 씁니다.
+    """
+    profile = get_cached_profile(db_path, user_id)
+    if profile is None:
+        previous_titles = [title for title, _ in get_previous_recommendations(user_id, db_path)]
+        profile = cache_profile(db_path, user_id, UserProfile(user_id, get_user_dislikes(user_id, db_path), previous_titles))
+    return profile
+
+def apply_user_filters(df, user_id, selected_title=None, profile=None):
+    """
+    싫어요/이전 추천 영화를 제외합니다.
+    제외 여부는 사용자 프로필의 카탈로그 마스크로 한 번에 계산합니다 (DB를 읽지 않음).
+    """
+    if profile is None:
+        profile = get_user_profile(user_id)
+
+    if isinstance(selected_title, list):
+        extra_titles = selected_title
+    else:
+        extra_titles = [selected_title] if selected_title else []
+
+    filtered_df = df[~profile.exclusion_mask(df, extra_titles)]
 
     print("📌 필터링된 영화 수:", len(filtered_df))
     return filtered_df
-
-init_db()
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+Embedding cache and offline embedder.
+
+Every embedding request goes through `CachedEmbeddings`, which stores float32
+vectors in SQLite keyed by (model name, text hash), so the same movie document
+is embedded at most once per model across restarts and sessions.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import List
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+embedding_cache_path = ".cache/embeddings.sqlite3"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LocalHashEmbeddings(Embeddings):
+    """
+    네트워크 없이 동작하는 결정적(deterministic) 임베딩.
+    단어와 글자 bigram을 해시해 고정 차원 벡터에 누적한 뒤 정규화합니다.
+    테스트와 벤치마크에서 OpenAIEmbeddings 대신 사용합니다.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.model_name = f"local-hash-{dim}"
+
+    def _features(self, text: str):
+        words = re.findall(r"\w+", text.lower())
+        yield from words
+        for word in words:
+            for i in range(len(word) - 1):
+                yield word[i:i + 2]
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    임베딩 모델을 감싸 (모델 이름, 텍스트 해시) → float32 벡터를 SQLite에 저장합니다.
+    캐시에 없는 텍스트만 원래 모델로 한 번에 요청합니다.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, db_path: str = embedding_cache_path):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                ) WITHOUT ROWID
+            """)
+        return self._conn
+
+    def _lookup(self, hashes) -> dict:
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            conn = self._connection()
+            # SQLite 변수 개수 제한을 피하기 위해 나눠서 조회
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                    [self.model_name, *chunk]
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _store(self, items):
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(self.model_name, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in items]
+            )
+            conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(text) for text in texts]
+        vectors = self._lookup(hashes)
+
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in vectors and h not in missing:
+                missing[h] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_vectors = self.underlying.embed_documents(list(missing.values()))
+            items = list(zip(missing.keys(), new_vectors))
+            self._store(items)
+            # 저장된 값과 같도록 float32로 맞춰서 반환
+            for h, v in items:
+                vectors[h] = np.asarray(v, dtype=np.float32).tolist()
+
+        return [vectors[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        h = text_hash(text)
+        vector = self._lookup([h]).get(h)
+        if vector is not None:
+            self.hits += 1
+            return vector
+        self.misses += 1
+        vector = self.underlying.embed_query(text)
+        self._store([(h, vector)])
+        return np.asarray(vector, dtype=np.float32).tolist()
@@ -6,7 +6,39 @@ Filtering helpers for movie metadata.
 import pandas as pd
 from typing import Set
 
+from catalog_index import get_catalog_index
+
 def filter_by_information(df, conditions):
+    """
+    배우/감독/제작사(부분 일치), 시청 연령(이하), 국가(일치) 조건으로 필터링합니다.
+    카탈로그 인덱스의 사전 계산된 구조로 조건별 마스크를 만들어 교집합을 구하고,
+    카탈로그에서 잘라낸 DataFrame이 아니면 기존 방식으로 계산합니다.
+    """
+    index = get_catalog_index()
+    positions = index.positions(df) if index is not None else None
+    if positions is None or (bool(conditions.get("target_age")) and not pd.api.types.is_numeric_dtype(df["target_age"])):
+        return filter_by_information_scan(df, conditions)
+
+    mask = None
+    def intersect(condition_mask):
+        nonlocal mask
+        mask = condition_mask if mask is None else mask & condition_mask
+
+    for column in ("actor", "director", "cp_name"):
+        if bool(conditions.get(column)):
+            intersect(index.contains_mask(column, str(conditions[column])))
+
+    if bool(conditions.get("target_age")):
+        intersect(index.at_most_mask("target_age", conditions["target_age"]))
+
+    if bool(conditions.get("national_name")):
+        intersect(index.equals_mask("national_name", conditions["national_name"]))
+
+    if mask is None:
+        return df.copy()
+    return df[mask[positions]]
+
+def filter_by_information_scan(df, conditions):
     df = df.copy()
 
     if bool(conditions.get("actor")):
@@ -19,7 +51,9 @@ def filter_by_information(df, conditions):
         df = df[df["cp_name"].astype(str).str.contains(str(conditions["cp_name"]), na=False)]
 
     if bool(conditions.get("target_age")):
-        df["target_age"] = pd.to_numeric(df["target_age"], errors="coerce")
+        # 스냅샷에서 읽은 카탈로그는 이미 숫자 타입이므로 변환을 건너뜀
+        if not pd.api.types.is_numeric_dtype(df["target_age"]):
+            df["target_age"] = pd.to_numeric(df["target_age"], errors="coerce")
         df = df[df["target_age"] <= conditions["target_age"]]
 
     if bool(conditions.get("national_name")):
@@ -35,6 +69,15 @@ def get_content_score(row, user_meta):
         score += len(matched)
     return score
 
+def get_content_scores(df, user_meta):
+    """df의 모든 행에 대해 get_content_score와 같은 점수를 Series로 반환"""
+    index = get_catalog_index()
+    positions = index.positions(df) if index is not None else None
+    if positions is None:
+        # 카탈로그 인덱스 밖의 DataFrame은 기존 방식으로 계산
+        return df.apply(lambda row: get_content_score(row, user_meta), axis=1)
+    return pd.Series(index.score(user_meta)[positions], index=df.index)
+
 
 # 최근 추천된 콘텐츠 제목 저장용 집합
 previous_recommend_titles: Set[str] = set()
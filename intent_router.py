@@ -0,0 +1,200 @@
+"""
+Single-pass intent router for user queries.
+
+All intent keywords are compiled into one Aho-Corasick automaton, so a query
+is scanned once and every intent is answered from the matches: completion,
+follow-up, similar-title, retry, recommendation and production-info requests.
+The title and credit-keyword regexes only run when the automaton saw a
+keyword they need; previously recommended titles are spotted through the
+catalog-wide title automaton (title_index.TitleSpotter). The per-intent functions in utils.py remain the reference
+behaviour (see benchmarks/intent_router.py).
+"""
+
+import re
+
+from catalog_index import get_catalog_index
+from text_index import AhoCorasick
+from title_index import find_titles
+
+# 이전 추천 목록을 가리키는 표현 (후속 질문)
+follow_up_phrases = ["이 중에", "이중에", "여기서", "영화들 중에", "영화 중에", "추천받은 영화 중에",
+                     "추천한 영화 중에", "알려준 영화 중에", "방금 추천한"]
+# 재추천: 제외 / 결합
+exclude_keywords = ["제외", "빼고", "빼줘", "빼서", "뺀", "제외하고", "빼고 추천", "재추천"]
+combine_keywords = ["다시 추천", "다른 영화"]
+recommendation_keywords = ["추천해줘", "추천해", "볼만한", "비슷한 영화", "유사한 영화", "영화 알려줘", '보고싶어', '추천해줄래']
+info_keywords = ["배우", "감독", "출연", "제작", "줄거리", "내용"]
+similar_keywords = ["비슷한", "유사한"]
+completion_keywords = ["완료"]
+
+# 제작 정보 검색 키워드 추출 (utils.filter_by_movie_info)
+credit_words = ["출연", "감독", "제작", "나오는", "줄거리", "내용"]
+credit_pattern = re.compile(r"(.*?)(이|가)?\s*(" + "|".join(credit_words) + r").*?(영화)?(추천해줘|알려줘)?")
+
+# 유사 추천 대상 제목 추출 (recommender.recommend_similar_contents)
+similar_title_patterns = [
+    re.compile(r'(.+?)(?:이랑|랑|과|와|같은|처럼.*?)\s*비슷한\s*영화'),
+    re.compile(r'(.+?)\s*같은\s*영화'),
+    re.compile(r'(.+?)\s*처럼\s*\S+\s*영화'),
+]
+
+
+def extract_similar_title(text: str):
+    """'X랑 비슷한 영화', 'X 같은 영화' 등에서 X의 (start, end) 구간 (없으면 None)"""
+    for pattern in similar_title_patterns:
+        match = pattern.search(text)
+        if match:
+            return _strip_span(text, *match.span(1))
+    return None
+
+
+def extract_credit_keyword(text: str):
+    """'X가 출연한 영화' 등에서 X의 (start, end) 구간 (없으면 None)"""
+    match = credit_pattern.search(text)
+    if not match:
+        return None
+    return _strip_span(text, *match.span(1))
+
+
+def find_previous_titles(text: str, previous_titles) -> list:
+    """text에서 언급된 이전 추천 제목의 (start, end) 구간 ("겨울왕국 2" → "(더빙) 겨울왕국 2")"""
+    index = get_catalog_index()
+    spotter = index.title_spotter() if index is not None else None
+    return [(start, end) for start, end, _ in find_titles(text, previous_titles, spotter)]
+
+
+def _strip_span(text: str, start: int, end: int):
+    """구간 앞뒤 공백을 제외 (group(1).strip()과 같은 부분)"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _longest(spans):
+    """겹치는 구간 중 먼저 시작하고 더 긴 것만 남김"""
+    selected = []
+    for start, end in sorted(spans, key=lambda span: (span[0], -span[1])):
+        if not selected or start >= selected[-1][1]:
+            selected.append((start, end))
+    return selected
+
+
+class Route:
+    """
+    한 입력에 대한 라우팅 결과.
+    intents는 매치된 의도 이름의 집합이고, spans는 의도/추출 항목별 (start, end) 구간 목록입니다.
+    추출 항목: title(유사 추천 대상 제목), exclusion(제외 키워드), credit(제작 정보 검색어)
+    """
+
+    def __init__(self, text: str, intents: set, spans: dict, retry_mode: str = ""):
+        self.text = text
+        self.intents = intents
+        self.spans = spans
+        self.retry_mode = retry_mode
+
+    def __contains__(self, intent: str) -> bool:
+        return intent in self.intents
+
+    def extract(self, name: str):
+        """추출 항목의 첫 번째 구간 문자열 (없으면 None)"""
+        spans = self.spans.get(name)
+        if not spans:
+            return None
+        start, end = spans[0]
+        return self.text[start:end]
+
+    def __repr__(self):
+        return f"Route({sorted(self.intents)}, spans={self.spans}, retry_mode={self.retry_mode!r})"
+
+
+class IntentRouter:
+    """의도 키워드 전체를 하나의 오토마톤으로 컴파일해 한 번의 순회로 분류합니다."""
+
+    groups = {
+        "complete": completion_keywords,
+        "follow_up": follow_up_phrases,
+        "exclude": exclude_keywords,
+        "combine": combine_keywords,
+        "recommendation": recommendation_keywords,
+        "movie_info": info_keywords,
+        "similar_word": similar_keywords,
+        "movie_word": ["영화"],
+        "credit_word": credit_words,
+    }
+
+    def __init__(self):
+        self.automaton = AhoCorasick()
+        for group, keywords in self.groups.items():
+            for keyword in keywords:
+                self.automaton.add(keyword, group)
+        self.automaton.build()
+
+    def route(self, text: str, previous_titles=()) -> Route:
+        """
+        text의 의도와 구간을 반환합니다.
+        previous_titles 중 하나가 입력에 언급되어도 후속 질문(follow_up)으로 봅니다.
+        """
+        found = {}
+        for start, end, group in self.automaton.iter_matches(text):
+            found.setdefault(group, []).append((start, end))
+
+        intents = set()
+        spans = {}
+
+        def mark(intent, intent_spans):
+            intents.add(intent)
+            spans.setdefault(intent, []).extend(intent_spans)
+
+        if "complete" in found:
+            mark("complete", found["complete"])
+
+        follow_up = found.get("follow_up", []) + find_previous_titles(text, previous_titles)
+        if follow_up:
+            mark("follow_up", _longest(follow_up))
+
+        # (비슷한|유사한).*영화 : 같은 줄에서 뒤에 '영화'가 나와야 함
+        similar = [
+            (start, movie_end)
+            for start, end in found.get("similar_word", [])
+            for movie_start, movie_end in found.get("movie_word", [])
+            if movie_start >= end and "\n" not in text[end:movie_start]
+        ]
+        if similar:
+            mark("similar", similar[:1])
+
+        if "exclude" in found:
+            mark("retry", _longest(found["exclude"]))
+            spans["exclusion"] = _longest(found["exclude"])
+            retry_mode = "제외"
+        elif "combine" in found:
+            mark("retry", found["combine"])
+            retry_mode = "결합"
+        else:
+            retry_mode = ""
+
+        if "recommendation" in found:
+            mark("recommendation", _longest(found["recommendation"]))
+        if "movie_info" in found:
+            mark("movie_info", found["movie_info"])
+
+        # 정규식 추출은 필요한 키워드가 있을 때만 실행
+        if "movie_word" in found:
+            title = extract_similar_title(text)
+            if title is not None:
+                spans["title"] = [title]
+        if "credit_word" in found:
+            credit = extract_credit_keyword(text)
+            if credit is not None:
+                spans["credit"] = [credit]
+
+        return Route(text, intents, spans, retry_mode)
+
+
+intent_router = IntentRouter()
+
+
+def route_query(text: str, previous_titles=()) -> Route:
+    """공유 라우터로 입력을 분류"""
+    return intent_router.route(text, previous_titles)
@@ -0,0 +1,127 @@
+"""
+Local closed-vocabulary keyword extractor.
+
+Every value the LLM may return is listed in `keyword_prompt`, so queries that
+name those values directly (or a known synonym) can be parsed locally into the
+same `user_meta` shape without an API call.
+"""
+
+import re
+
+from config import keyword_columns
+from text_index import AhoCorasick
+
+# 사용자가 자주 쓰는 표현 → 키워드 목록의 값
+keyword_synonyms = {
+    "기분 전환": ["즐거운"],
+    "기분전환": ["즐거운"],
+    "속상한": ["슬픈"],
+    "속상해": ["슬픈"],
+    "스트레스": ["통쾌한"],
+    "신나는": ["아주 신나는"],
+    "신나": ["아주 신나는"],
+    "웃긴": ["유머러스한", "코미디"],
+    "웃기는": ["유머러스한", "코미디"],
+    "재밌는": ["즐거운"],
+    "재미있는": ["즐거운"],
+    "감동": ["감동적인"],
+    "긴장감": ["긴장감 넘치는"],
+    "무섭": ["무서운"],
+    "외로운": ["쓸쓸한"],
+    "외로워": ["쓸쓸한"],
+    "행복": ["행복한"],
+    "화나는": ["화가 나는"],
+    "설렘": ["설레는"],
+    "반전": ["충격과 반전"],
+    "위로": ["따뜻한 위로"],
+    "우울해": ["우울한"],
+    "슬퍼": ["슬픈"],
+    "편하게": ["편안한"],
+    "로맨틱": ["로맨틱한"],
+    "잔인": ["잔인한"],
+    "호러": ["공포", "호러"],
+    "애니": ["애니메이션"],
+    "가족 영화": ["가족", "어린이/키즈/가족"],
+}
+
+# 추천 요청 문장에 흔히 붙는 표현 (신뢰도 계산에서 제외)
+request_word_prefixes = (
+    "영화", "추천", "해줘", "해주", "알려", "보고", "볼만", "싶", "좀", "주세요", "줘", "요즘", "하나", "몇",
+    "같은", "느낌", "분위기", "있는", "그런", "나오는", "콘텐츠", "작품",
+)
+
+
+def parse_vocabulary(prompt: str) -> dict:
+    """키워드 프롬프트의 `카테고리 (값1, 값2, ...)` 줄을 카테고리 → 값 목록으로 변환"""
+    vocabulary = {}
+    for line in prompt.splitlines():
+        match = re.match(r"^(\w+) \((.*)\)\s*$", line.strip())
+        if match and match.group(1) in keyword_columns:
+            vocabulary[match.group(1)] = [v.strip() for v in match.group(2).split(",") if v.strip()]
+    return vocabulary
+
+
+class LocalKeywordExtractor:
+    """
+    키워드 목록 전체(및 동의어)를 Aho-Corasick 오토마톤으로 컴파일해
+    사용자 입력에서 extract_user_meta와 같은 형태의 user_meta를 찾습니다.
+    """
+
+    def __init__(self, vocabulary: dict, synonyms: dict = keyword_synonyms, max_per_category: int = 5):
+        self.max_per_category = max_per_category
+        self.automaton = AhoCorasick()
+
+        term_categories = {}
+        for category, terms in vocabulary.items():
+            for term in terms:
+                term_categories.setdefault(term, []).append(category)
+                for surface in self._surfaces(term):
+                    self.automaton.add(surface.lower(), (category, term))
+
+        for phrase, terms in synonyms.items():
+            for term in terms:
+                for category in term_categories.get(term, []):
+                    for surface in self._surfaces(phrase):
+                        self.automaton.add(surface.lower(), (category, term))
+
+        self.automaton.build()
+
+    @staticmethod
+    def _surfaces(term: str):
+        """
+        값 자체, 띄어쓰기를 뺀 형태, '/'로 나뉜 각 부분 (모두 2글자 이상).
+        한 글자 값(새, 신, 봄 등)은 뜻이 여러 가지라("새 영화" = 새로운 영화) 로컬에서 찾지 않고 GPT에 맡깁니다.
+        """
+        surfaces = {term, term.replace(" ", "")}
+        if "/" in term:
+            surfaces.update(part.strip() for part in term.split("/"))
+            surfaces.update(part.strip().replace(" ", "") for part in term.split("/"))
+        return {surface for surface in surfaces if len(surface) >= 2}
+
+    @staticmethod
+    def _coverage(query: str, spans) -> float:
+        """요청 표현을 제외한 어절 중 키워드 매치가 걸친 어절의 비율"""
+        words = [(m.start(), m.end(), m.group()) for m in re.finditer(r"[^\s.,!?~]+", query)]
+        content = [(s, e) for s, e, w in words if not w.startswith(request_word_prefixes)]
+        if not content:
+            return 0.0
+        covered = sum(1 for s, e in content if any(ms < e and s < me for ms, me in spans))
+        return covered / len(content)
+
+    def extract(self, query: str):
+        """
+        (user_meta, confidence)를 반환합니다.
+        confidence는 0~1 사이 값으로, 입력의 내용 어절 중 키워드로 설명된 비율입니다.
+        """
+        user_meta = {category: [] for category in keyword_columns}
+        spans = []
+        text = query.lower()
+        for start, end, (category, term) in self.automaton.longest_matches(text):
+            spans.append((start, end))
+            values = user_meta[category]
+            if term not in values and len(values) < self.max_per_category:
+                values.append(term)
+
+        if not any(user_meta.values()):
+            return user_meta, 0.0
+        return user_meta, self._coverage(query, spans)
@@ -3,34 +3,58 @@
 CLI entry point for the movie recommendation service.
 """
 
-from langchain.schema import Document
-from langchain.vectorstores import FAISS
-
 from database import *
 from utils import *
 from recommender import *
 
-from vector_db import build_vectorstore, build_qa_chain
-from data_loader import load_dataframe
+from vector_db import build_vectorstore, build_qa_chain, build_follow_up_chain, build_movie_subindex, get_embedding_model, stream_chain_answer
+from data_loader import get_dataframe, build_documents
 from config import model_name, embedding_model_name
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.chat_models import ChatOpenAI
-from langchain.chains import ConversationalRetrievalChain
+from intent_router import route_query
 
+import asyncio
 from typing import List
 
-# Global models
-embedding_model = OpenAIEmbeddings(model=embedding_model_name)
-llm = ChatOpenAI(model_name=model_name, temperature=0.3)
-
-# Load data at startup
-df = load_dataframe()
-# Todo: 삭제
-df = df[:100]
-vectorstore_global = build_vectorstore(df["document"].apply(lambda x: Document(page_content=x, metadata={})).tolist())
-qa_chain = build_qa_chain(vectorstore_global)
+_resources = None
+
+def get_resources():
+    """
+    모델, 데이터, 벡터스토어, QA 체인을 처음 필요할 때 한 번만 생성합니다.
+    (import 시점에는 아무 것도 만들지 않음)
+    """
+    global _resources
+    if _resources is None:
+        embedding_model = get_embedding_model()
+        df = get_dataframe()
+        # Todo: 삭제
+        df = df[:100]
+        vectorstore_global = build_vectorstore(build_documents(df))
+        qa_chain = build_qa_chain(vectorstore_global)
+        _resources = {
+            "embedding_model": embedding_model,
+            "df": df,
+            "vectorstore_global": vectorstore_global,
+            "qa_chain": qa_chain,
+        }
+    return _resources
+
+def print_stream(tokens):
+    """답변 토큰을 생성되는 대로 출력하고 전체 텍스트를 반환"""
+    print("🤖 GPT:")
+    chunks = []
+    for token in tokens:
+        chunks.append(token)
+        print(token, end="", flush=True)
+    print()
+    return "".join(chunks)
 
 def main_chat_loop():
+    resources = get_resources()
+    embedding_model = resources["embedding_model"]
+    df = resources["df"]
+    vectorstore_global = resources["vectorstore_global"]
+    qa_chain = resources["qa_chain"]
+
     user_name = input("👋 당신의 이름을 알려주세요: ").strip()
     user_id = get_or_create_user_id(user_name)
     print(f"{user_name}님 안녕하세요? 영화 추천을 시작합니다 😊")
@@ -51,9 +75,13 @@ def main_chat_loop():
             break
 
         interaction_id = create_interaction(user_id, query)
+        # 입력 의도를 한 번의 순회로 분류
+        route = route_query(
+            query, last_recommend_df["title"].tolist() if last_recommend_df is not None and not last_recommend_df.empty else []
+        )
 
         # ✅ 완료 처리
-        if "완료" in query:
+        if "complete" in route:
             if last_recommend_df is None or last_recommend_df.empty:
                 print("⚠️ 이전에 추천된 영화가 없습니다. 먼저 추천을 받아주세요.")
                 continue
@@ -66,100 +94,86 @@ def main_chat_loop():
 
         # ✅ 후속 질문 처리
         if not first_turn and last_recommend_df is not None and not last_recommend_df.empty:
-            if is_follow_up_question(query, last_recommend_df["title"].tolist()):
+            if "follow_up" in route:
                 print("📌 후속 질문으로 판단됨 → 이전 추천 콘텐츠에서 검색 중...")
-                local_docs = [
-                    Document(page_content=truncate_document(row["document"]), metadata={"title": row["title"]})
-                    for _, row in last_recommend_df.iterrows()
-                ]
-                local_store = FAISS.from_documents(local_docs, embedding_model)
-                local_chain = ConversationalRetrievalChain.from_llm(
-                    llm=llm,
-                    retriever=local_store.as_retriever(),
-                    memory=None
-                )
-                result = local_chain.invoke({"question": query, "chat_history": []})
-                print("🤖 GPT:\n", result["answer"])
+                # 글로벌 인덱스의 벡터를 재사용해 추천된 영화만으로 검색 (재임베딩 없음)
+                local_store = build_movie_subindex(vectorstore_global, last_recommend_df, embedding_model)
+                local_chain = build_follow_up_chain(local_store)
+                print_stream(stream_chain_answer(local_chain, {"question": query, "chat_history": []}))
                 continue
 
-            if is_similar_recommendation(query):
+            if "similar" in route:
                 print("is_similar_recommendation")
                 df_recommend = handle_similar_recommendation(query, df, user_id, selected_title, extract_user_meta, keyword_columns)
                 if df_recommend.empty:
                     print("🤖 GPT:\n죄송해요, 유사한 콘텐츠를 찾지 못했어요.")
                     continue
-                response_text = generate_recommendation_response(query, df_recommend, user_name)
-                print("🤖 GPT:\n", response_text)
+                print_stream(stream_recommendation_response(query, df_recommend, user_name))
                 log_recommendations(interaction_id, df_recommend["title"].tolist())
                 last_recommend_df = df_recommend.copy()
                 last_recommend_query = query
                 continue
 
-            is_retry, retry_mode = is_retry_request(query)
+            is_retry, retry_mode = "retry" in route, route.retry_mode
             if is_retry and last_recommend_query:
                 # ── 1) 재추천 분기 ──
                 print(f"🔁 재추천 요청 ({retry_mode}) → 이전 쿼리로 키워드 추출: {last_recommend_query}")
                 # (1) merged_query는 이전 쿼리 재사용
                 merged_query = last_recommend_query
-                # (2) user_meta는 직전에 저장해 둔 메타 재활용
-                user_meta = extract_user_meta(merged_query)
-                last_user_meta    = user_meta
-                # (3) 재추천 핸들러 호출 (selected_title이 있으면 넘겨주고, 없으면 None)
+                # (2) 직전 추천 목록은 제외하고 재추천 (키워드는 캐시된 추출 결과 재사용)
                 last_selected_title=df_recommend["title"].tolist()
-                df_recommend = handle_recommendation(df,user_id,user_meta,  selected_title=last_selected_title   )
+                turn = asyncio.run(recommend_turn(
+                    merged_query, df, user_id, user_name,
+                    interaction_id=interaction_id,
+                    selected_title=last_selected_title,
+                    is_retry=True,
+                    stream=True
+                ))
             else:
                 # ── 2) 첫 추천 분기 ──
                 merged_query = query
-                # (1) query에서 한 번만 메타 추출
-                user_meta = extract_user_meta(merged_query)
-                # (2) 세션에 저장
-                last_user_meta = user_meta
                 last_recommend_query = merged_query
-                # (3) 첫 추천 핸들러 호출
-                df_recommend = handle_recommendation(
-                    df,
-                    user_id=user_id,
-                    user_meta=user_meta
-                )
+                # 키워드 추출, 필터 조회, 응답 생성, 로그 저장을 파이프라인으로 실행
+                turn = asyncio.run(recommend_turn(
+                    merged_query, df, user_id, user_name,
+                    interaction_id=interaction_id,
+                    is_retry=is_retry,
+                    stream=True
+                ))
+            last_user_meta = turn["user_meta"]
+            df_recommend = turn["df_recommend"]
 
             # ── 공통: 추천 결과 출력 및 상태 업데이트 ──
             if df_recommend is None or df_recommend.empty:
                 print("🤖 GPT:\n죄송해요, 추천할 콘텐츠를 찾지 못했어요.")
                 continue
-            response_text = generate_recommendation_response(merged_query,df_recommend,user_name,is_retry=is_retry)
-            print("🤖 GPT:\n", response_text)
-            log_recommendations(interaction_id, df_recommend["title"].tolist())
+            print_stream(turn["response_stream"])
 
             # 재추천 이후에도 last_selected_title 은
             # 사용자가 선택했을 때 별도 로직으로 업데이트해두세요.
             last_recommend_df = df_recommend.copy()
             first_turn = False
 
-        if first_turn and is_recommendation_request(query):
+        if first_turn and "recommendation" in route:
             print("first question")
 
-            # ① user_meta 한 번만 추출
-            user_meta = extract_user_meta(query)
-            # (필요하다면 세션에도 저장)
-            last_user_meta = user_meta
-
-            # ② 수정된 handle_recommendation 호출
-            #    시그니처: handle_recommendation(df, user_id, user_meta, selected_title=None)
-            df_recommend = handle_recommendation(
-                df,
-                user_id,
-                user_meta,
-                selected_title  # 첫 추천 단계이므로 보통 None
-            )
+            # ① 키워드 추출과 필터 조회를 동시에 실행하고 추천/응답 생성
+            #    (selected_title은 첫 추천 단계이므로 보통 None)
+            turn = asyncio.run(recommend_turn(
+                query, df, user_id, user_name,
+                interaction_id=interaction_id,
+                selected_title=selected_title,
+                stream=True
+            ))
+            last_user_meta = turn["user_meta"]
+            df_recommend = turn["df_recommend"]
 
             if df_recommend.empty:
                 print("🤖 GPT:\n죄송해요, 적절한 콘텐츠를 찾지 못했어요.")
                 continue
 
-            response_text = generate_recommendation_response(query, df_recommend, user_name)
-            print("🤖 GPT:\n", response_text)
-
-            log_recommendations(interaction_id, df_recommend["title"].tolist())
+            # ② 응답을 토큰 단위로 출력 (추천 로그는 파이프라인이 백그라운드에서 저장)
+            print_stream(turn["response_stream"])
 
             # ③ 상태 업데이트
             last_recommend_df    = df_recommend.copy()
@@ -172,8 +186,7 @@ def main_chat_loop():
         else:
             print("🟠 일반 질문으로 판단 → QA 체인 실행")
             try:
-                result = qa_chain.invoke({"question": query})
-                print("🤖 GPT:\n", result["answer"])
+                print_stream(stream_chain_answer(qa_chain, {"question": query}))
             except Exception as e:
                 print("❌ 토큰 초과 또는 처리 오류 → 일반 응답 불가")
                 print("🤖 GPT:\n죄송해요, 해당 질문에는 답변할 수 없습니다.")
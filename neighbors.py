@@ -0,0 +1,298 @@
+"""
+Precomputed item-to-item neighbor table for similar-title recommendations.
+
+For every title the table keeps the top-N catalog rows under the same
+keyword-overlap score `recommend_similar_contents` uses (optionally blended
+with document embedding similarity), in ranking.py order. It is written by an
+offline job and refreshed incrementally when rows are appended to the catalog:
+
+    python neighbors.py [--top-n 50] [--embedding-weight 0.0] [--full]
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from catalog_index import CatalogIndex, get_catalog_index
+from config import keyword_columns
+from ranking import top_k_order
+
+neighbors_path = ".cache/neighbors.npz"
+neighbor_count = 50        # 제목별로 저장할 이웃 수
+reference_batch = 256      # 한 번에 점수를 계산할 기준 제목 수
+
+
+def row_hashes(df: pd.DataFrame, columns) -> np.ndarray:
+    """행 내용(제목, 평점, 키워드 컬럼)의 해시. 카탈로그가 바뀌었는지 확인하는 데 사용"""
+    fields = [c for c in ["title", "content_id", "national_name", "rating", *columns] if c in df.columns]
+    return pd.util.hash_pandas_object(df[fields].astype(str), index=False).to_numpy()
+
+
+class NeighborTable:
+    """
+    제목 → 비슷한 카탈로그 행 위치(점수 높은 순) 테이블.
+    neighbors[i]는 titles[i]의 이웃 행 위치이며, 빈 칸은 -1입니다.
+    """
+
+    def __init__(self, columns, hashes, titles, references, neighbors, scores, embedding_weight: float = 0.0):
+        self.columns = list(columns)
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.titles = np.asarray(titles, dtype=object)
+        self.references = np.asarray(references, dtype=np.int64)
+        self.neighbors = np.asarray(neighbors, dtype=np.int32)
+        self.scores = np.asarray(scores)
+        self.embedding_weight = float(embedding_weight)
+        self.top_n = self.neighbors.shape[1]
+        self._rows = {title: i for i, title in enumerate(self.titles.tolist())}
+
+    def lookup(self, title):
+        """(기준 행 위치, 이웃 행 위치 배열, 점수 배열). 테이블에 없는 제목이면 None"""
+        i = self._rows.get(title)
+        if i is None:
+            return None
+        count = int((self.neighbors[i] >= 0).sum())
+        return int(self.references[i]), self.neighbors[i, :count], self.scores[i, :count]
+
+    def matches(self, df: pd.DataFrame, columns=keyword_columns) -> bool:
+        """df가 테이블을 만들 때의 카탈로그와 같은지"""
+        return list(columns) == self.columns and np.array_equal(row_hashes(df, columns), self.hashes)
+
+    def save(self, file_path: str = neighbors_path):
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 임시 파일에 쓴 뒤 교체해 중간에 끊겨도 깨진 테이블이 남지 않게 함
+        with open(file_path + ".tmp", "wb") as f:
+            np.savez_compressed(
+                f, columns=np.asarray(self.columns, dtype=str), hashes=self.hashes,
+                titles=np.asarray(self.titles, dtype=str), references=self.references,
+                neighbors=self.neighbors, scores=self.scores,
+                embedding_weight=np.float64(self.embedding_weight),
+            )
+        os.replace(file_path + ".tmp", file_path)
+
+    @classmethod
+    def load(cls, file_path: str = neighbors_path):
+        """저장된 테이블 (없거나 읽을 수 없으면 None)"""
+        if not os.path.exists(file_path):
+            return None
+        try:
+            with np.load(file_path) as data:
+                return cls(data["columns"].tolist(), data["hashes"], data["titles"].tolist(), data["references"],
+                           data["neighbors"], data["scores"], float(data["embedding_weight"]))
+        except Exception as e:
+            print("❗ 이웃 테이블 로드 실패:", e)
+            return None
+
+
+def _token_matrix(index, columns):
+    """
+    (카탈로그 행 × 키워드 토큰) 0/1 행렬과 기준 행별 질의 행렬.
+    질의 쪽은 recommend_similar_contents처럼 값을 콤마로만 나누므로(strip 없음)
+    posting list에 그대로 있는 토큰만 점수에 반영됩니다.
+    """
+    vocabulary = {}
+    for column in columns:
+        for token in index.token_postings(column):
+            vocabulary[(column, token)] = len(vocabulary)
+
+    matrix = np.zeros((index.size, len(vocabulary)), dtype=np.float32)
+    for (column, token), j in vocabulary.items():
+        matrix[index.token_postings(column)[token], j] = 1
+
+    values = {column: index.df[column].tolist() if column in index.df.columns else [""] * index.size
+              for column in columns}
+
+    def queries(references):
+        query = np.zeros((len(references), len(vocabulary)), dtype=np.float32)
+        for i, pos in enumerate(references):
+            for column in columns:
+                for token in set(str(values[column][pos]).split(",")):
+                    j = vocabulary.get((column, token))
+                    if j is not None:
+                        query[i, j] = 1
+        return query
+
+    return matrix, queries
+
+
+def _similarity(index, columns, vectors, embedding_weight):
+    """similarity(references, rows) → (len(references) × len(rows)) 점수 행렬"""
+    matrix, queries = _token_matrix(index, columns)
+    if embedding_weight and vectors is not None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def similarity(references, rows):
+        scores = queries(references) @ matrix[rows].T
+        if embedding_weight and vectors is not None:
+            scores = scores + embedding_weight * (vectors[references] @ vectors[rows].T)
+        return scores
+
+    return similarity
+
+
+def _ordered_top(scores, rows, top_n, ratings):
+    """rows 중 ranking.py 순서(점수, 평점, 위치)로 상위 top_n개의 (행 위치, 점수)"""
+    order = top_k_order(scores, top_n, ratings[rows], rows)
+    return rows[order], scores[order]
+
+
+def build_neighbor_table(df: pd.DataFrame = None, columns=keyword_columns, top_n: int = neighbor_count,
+                         previous: NeighborTable = None, vectors=None, embedding_weight: float = 0.0) -> NeighborTable:
+    """
+    카탈로그의 모든 제목에 대해 이웃 테이블을 만듭니다.
+    previous가 같은 설정으로 만든 테이블이고 카탈로그에 행이 뒤에 추가되기만 했다면,
+    기존 제목은 새 행과만 비교해 합치고 새 제목만 전체와 비교합니다.
+    """
+    index = get_catalog_index()
+    if df is None:
+        df = index.df
+    elif index is None or index.df is not df:
+        index = CatalogIndex(df)
+
+    columns = list(columns)
+    hashes = row_hashes(df, columns)
+    titles_column = df["title"].astype(str).to_numpy()
+    ratings = pd.to_numeric(df["rating"], errors="coerce").to_numpy(dtype=float)
+    similarity = _similarity(index, columns, vectors, embedding_weight)
+    score_dtype = np.float32 if embedding_weight else np.int16
+
+    # 제목별 기준 행은 카탈로그에서 처음 나오는 행
+    titles, references = np.unique(titles_column, return_index=True)
+    order = np.argsort(references, kind="stable")
+    titles, references = titles[order].tolist(), references[order]
+
+    reusable = (
+        previous is not None and previous.columns == columns and previous.top_n == top_n
+        and previous.embedding_weight == float(embedding_weight)
+        and len(previous.hashes) <= len(hashes) and np.array_equal(previous.hashes, hashes[:len(previous.hashes)])
+    )
+    old_size = len(previous.hashes) if reusable else 0
+    new_rows = np.arange(old_size, len(df))
+
+    neighbors = np.full((len(titles), top_n), -1, dtype=np.int32)
+    scores = np.zeros((len(titles), top_n), dtype=score_dtype)
+    full, merged = [], []
+    for i, title in enumerate(titles):
+        (merged if reusable and previous.lookup(title) is not None else full).append(i)
+
+    # 기존 제목: 이전 이웃 + 새로 추가된 행 중 상위 top_n
+    for start in range(0, len(merged), reference_batch):
+        batch = merged[start:start + reference_batch]
+        new_scores = similarity(references[batch], new_rows) if len(new_rows) else None
+        for b, i in enumerate(batch):
+            _, old_rows, old_scores = previous.lookup(titles[i])
+            rows, row_scores = old_rows.astype(np.int64), old_scores.astype(float)
+            if new_scores is not None:
+                keep = titles_column[new_rows] != titles[i]
+                rows = np.concatenate([rows, new_rows[keep]])
+                row_scores = np.concatenate([row_scores, new_scores[b][keep]])
+            top_rows, top_scores = _ordered_top(row_scores, rows, top_n, ratings)
+            neighbors[i, :len(top_rows)] = top_rows
+            scores[i, :len(top_rows)] = top_scores
+
+    # 새 제목(또는 전체 재계산): 카탈로그 전체와 비교
+    all_rows = np.arange(len(df))
+    for start in range(0, len(full), reference_batch):
+        batch = full[start:start + reference_batch]
+        batch_scores = similarity(references[batch], all_rows)
+        for b, i in enumerate(batch):
+            keep = titles_column != titles[i]
+            top_rows, top_scores = _ordered_top(batch_scores[b][keep].astype(float), all_rows[keep], top_n, ratings)
+            neighbors[i, :len(top_rows)] = top_rows
+            scores[i, :len(top_rows)] = top_scores
+
+    print(f"🧭 이웃 테이블: 제목 {len(titles)}개 (전체 계산 {len(full)}개, 새 행과 병합 {len(merged)}개)")
+    return NeighborTable(columns, hashes, titles, references, neighbors, scores, embedding_weight)
+
+
+def refresh_neighbor_table(df: pd.DataFrame = None, file_path: str = neighbors_path, full: bool = False,
+                           **options) -> NeighborTable:
+    """저장된 테이블을 현재 카탈로그에 맞게 (가능하면 증분으로) 갱신하고 저장"""
+    previous = None if full else NeighborTable.load(file_path)
+    table = build_neighbor_table(df, previous=previous, **options)
+    table.save(file_path)
+    return table
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_neighbor_table(columns=keyword_columns, file_path: str = neighbors_path):
+    """
+    현재 카탈로그와 일치하는 저장된 이웃 테이블 (없거나 오래되었으면 None).
+    확인은 카탈로그 인덱스마다 한 번만 합니다.
+    """
+    global _table
+    index = get_catalog_index()
+    if index is None:
+        return None
+    with _table_lock:
+        if _table is None or _table[0] is not index or _table[1] != list(columns):
+            table = NeighborTable.load(file_path)
+            if table is not None and not table.matches(index.df, columns):
+                print("⚠️ 이웃 테이블이 현재 카탈로그와 다릅니다. `python neighbors.py`로 갱신하세요.")
+                table = None
+            _table = (index, list(columns), table)
+        return _table[2]
+
+
+def similar_rows(df: pd.DataFrame, title, k: int = 5, columns=keyword_columns):
+    """
+    df에서 title과 비슷한 상위 k개 행 (score 컬럼 포함).
+    테이블의 이웃 목록을 순서대로 읽어 df에 남아 있는 행만 고르며,
+    테이블이 없거나 이 df에 대해 답할 수 없으면 None을 반환합니다.
+    """
+    table = get_neighbor_table(columns)
+    found = table.lookup(str(title)) if table is not None else None
+    if found is None:
+        return None
+    index = get_catalog_index()
+    positions = index.positions(df)
+    if positions is None:
+        return None
+    reference, rows, scores = found
+    # df에서 처음 나오는 같은 제목 행이 테이블의 기준 행이어야 같은 결과
+    same_title = np.flatnonzero(df["title"].to_numpy() == title)
+    if not len(same_title) or positions[same_title[0]] != reference:
+        return None
+
+    # 카탈로그 위치 → df의 행 번호 (제외된 행은 -1)
+    frame_rows = np.full(index.size, -1, dtype=np.int64)
+    frame_rows[positions] = np.arange(len(positions))
+    present = frame_rows[rows] >= 0
+    # 잘린 목록에서 k개를 채우지 못하면 목록 밖의 행이 들어갈 수 있음
+    if present.sum() < k and len(rows) == table.top_n:
+        return None
+    selected = np.flatnonzero(present)[:k]
+    score_values = scores[selected].astype(np.int64) if table.embedding_weight == 0 else scores[selected]
+    return df.iloc[frame_rows[rows[selected]]].assign(score=score_values)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from data_loader import get_dataframe
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-n", type=int, default=neighbor_count)
+    parser.add_argument("--embedding-weight", type=float, default=0.0,
+                        help="문서 임베딩 코사인 유사도를 더할 비율 (0이면 키워드 점수만 사용)")
+    parser.add_argument("--full", action="store_true", help="저장된 테이블을 무시하고 전부 다시 계산")
+    args = parser.parse_args()
+
+    df = get_dataframe()
+    vectors = None
+    if args.embedding_weight:
+        from vector_db import get_embedding_model
+        vectors = get_embedding_model().embed_documents(df["document"].tolist())
+
+    start = time.perf_counter()
+    refresh_neighbor_table(df, full=args.full, top_n=args.top_n, vectors=vectors,
+                           embedding_weight=args.embedding_weight)
+    print(f"✅ {neighbors_path} 저장 ({time.perf_counter() - start:.2f} s)")
@@ -0,0 +1,78 @@
+"""
+Cache for keyword extraction results keyed by the normalized query text.
+
+Lookups go through an in-process LRU first and then the persistent
+`user_meta_cache` table, so identical prompts are sent to the LLM only once.
+"""
+
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from database import get_cached_user_meta, save_cached_user_meta
+
+
+def normalize_query(query: str) -> str:
+    """대소문자, 공백, 끝 문장부호 차이를 없앤 캐시 키"""
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return re.sub(r"[\s.!?~…]+$", "", text)
+
+
+def cache_namespace(*parts: str) -> str:
+    """모델 이름과 프롬프트로 만든 네임스페이스 (둘 중 하나가 바뀌면 캐시가 갈림)"""
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class UserMetaCache:
+    """정규화된 쿼리 → user_meta dict 캐시 (메모리 LRU + SQLite)"""
+
+    def __init__(self, namespace: str, capacity: int = 1024):
+        self.namespace = namespace
+        self.capacity = capacity
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, user_meta: dict):
+        with self._lock:
+            self._entries[key] = user_meta
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def get(self, query: str):
+        """캐시된 user_meta의 사본을 반환, 없으면 None"""
+        key = normalize_query(query)
+        with self._lock:
+            user_meta = self._entries.get(key)
+            if user_meta is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if user_meta is None:
+            user_meta = get_cached_user_meta(key, self.namespace)
+            if user_meta is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db_hits += 1
+            self._remember(key, user_meta)
+        return {category: list(values) for category, values in user_meta.items()}
+
+    def put(self, query: str, user_meta: dict):
+        key = normalize_query(query)
+        user_meta = {category: list(values) for category, values in user_meta.items()}
+        self._remember(key, user_meta)
+        save_cached_user_meta(key, self.namespace, user_meta)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+        }
@@ -0,0 +1,172 @@
+"""
+Top-k ranking shared by the recommend_* functions.
+
+Results are ordered by score (desc), then rating (desc, missing last), then
+movie_id (catalog row position). Only the k best rows are selected
+(argpartition) instead of sorting the whole scored frame. Keyword scores over
+the catalog come from the token posting lists, optionally walked
+MaxScore-style so rows that can no longer reach the top-k are skipped.
+"""
+
+import numpy as np
+import pandas as pd
+
+from catalog_index import get_catalog_index
+from filters import get_content_scores
+
+
+def top_k_order(scores, k: int, ratings=None, ids=None) -> np.ndarray:
+    """
+    scores에서 상위 k개의 위치를 순서대로 반환합니다.
+    점수가 같으면 평점(높은 순, 없으면 맨 뒤), 그다음 ids(작은 순, 기본은 위치)로 정렬합니다.
+    """
+    scores = np.asarray(scores, dtype=float)
+    n = len(scores)
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if ids is None:
+        ids = np.arange(n)
+    if ratings is None:
+        ratings = np.zeros(n)
+    ratings = np.where(np.isnan(ratings), -np.inf, ratings)
+
+    if k < n:
+        # k번째 점수와 같은 행까지 후보로 남겨 동점은 평점/ID로 가름
+        kth = np.partition(-scores, k - 1)[k - 1]
+        candidates = np.flatnonzero(-scores <= kth)
+    else:
+        candidates = np.arange(n)
+    # lexsort는 마지막 키가 1순위
+    order = np.lexsort((ids[candidates], -ratings[candidates], -scores[candidates]))
+    return candidates[order[:k]]
+
+
+def rank_frame(df: pd.DataFrame, scores, k: int = 5, min_score=None, mask=None) -> pd.DataFrame:
+    """
+    df에서 점수 상위 k개 행을 score 컬럼과 함께 반환합니다.
+    mask가 False인 행과 점수가 min_score 이하인 행은 제외합니다.
+    """
+    scores = np.asarray(scores)
+    keep = np.ones(len(df), dtype=bool) if mask is None else np.asarray(mask, dtype=bool).copy()
+    if min_score is not None:
+        keep &= scores > min_score
+    rows = np.flatnonzero(keep)
+
+    order = top_k_order(scores[rows], k, _ratings(df)[rows], _ids(df)[rows])
+    selected = rows[order]
+    return df.iloc[selected].assign(score=scores[selected])
+
+
+def rank_by_keywords(df: pd.DataFrame, user_meta: dict, k: int = 5, mask=None, prune: bool = False) -> pd.DataFrame:
+    """
+    user_meta 키워드 점수(get_content_score)가 0보다 큰 행 중 상위 k개를 반환합니다.
+    카탈로그에서 잘라낸 DataFrame이면 토큰 posting list로 점수를 계산하고,
+    prune=True이면 MaxScore 방식으로 상위 k에 들 수 없는 행을 건너뜁니다.
+    (현재 카탈로그 크기에서는 전체 누적이 더 빠름: benchmarks/ranking.py)
+    """
+    index = get_catalog_index()
+    positions = index.positions(df) if index is not None else None
+    if positions is None:
+        return rank_frame(df, get_content_scores(df, user_meta).to_numpy(), k, min_score=0, mask=mask)
+
+    allowed = np.zeros(index.size, dtype=bool)
+    allowed[positions if mask is None else positions[np.asarray(mask, dtype=bool)]] = True
+    if prune:
+        catalog_rows, scores = max_score_top_k(index, user_meta, k, allowed)
+    else:
+        catalog_rows, scores = dense_top_k(index, user_meta, k, allowed)
+
+    # 카탈로그 위치 → df의 행 번호
+    frame_rows = np.full(index.size, -1, dtype=np.int64)
+    frame_rows[positions] = np.arange(len(positions))
+    return df.iloc[frame_rows[catalog_rows]].assign(score=scores)
+
+
+def dense_top_k(index, user_meta: dict, k: int, allowed: np.ndarray):
+    """allowed 카탈로그 행 중 키워드 점수 상위 k개의 (행 위치, 점수). 모든 posting list를 한 번에 누적"""
+    scores = index.score(user_meta)
+    candidates = np.flatnonzero(allowed & (scores > 0))
+    order = top_k_order(scores[candidates], k, _catalog_ratings(index)[candidates], candidates)
+    selected = candidates[order]
+    return selected, scores[selected]
+
+
+def max_score_top_k(index, user_meta: dict, k: int, allowed: np.ndarray):
+    """
+    allowed 카탈로그 행 중 키워드 점수 상위 k개의 (행 위치, 점수)를 반환합니다.
+
+    키워드 하나는 1점이므로, 짧은 posting list부터 더해 가면 아직 나오지 않은 행의
+    최대 점수는 남은 키워드 수입니다. 현재 k번째 점수가 그보다 커지면 새 행은 상위 k에
+    들 수 없으므로, 남은 긴 list에서는 이미 후보인 행만 이진 탐색으로 확인하고
+    남은 키워드를 모두 더해도 k번째 점수에 못 미치는 후보는 바로 버립니다.
+    """
+    terms = []
+    for category, keywords in user_meta.items():
+        postings = index.token_postings(category)
+        for keyword in set(keywords):
+            rows = postings.get(keyword)
+            if rows is not None:
+                terms.append(rows)
+    terms.sort(key=len)
+
+    # 앞쪽 절반은 점수가 남은 키워드 수를 넘을 수 없으므로 한 번에 더함
+    split = len(terms) // 2
+    if split:
+        scores = np.bincount(np.concatenate(terms[:split]), minlength=index.size)
+    else:
+        scores = np.zeros(index.size, dtype=np.int64)
+
+    candidates = None
+    for i in range(split, len(terms)):
+        rows = terms[i]
+        if candidates is None:
+            scores[rows] += 1
+            remaining = len(terms) - i - 1
+            threshold = _kth_score(scores, allowed, k)
+            if threshold > remaining:
+                candidates = np.flatnonzero(allowed & (scores + remaining >= threshold))
+        else:
+            # posting list는 행 위치 오름차순
+            hits = np.minimum(np.searchsorted(rows, candidates), len(rows) - 1)
+            scores[candidates[rows[hits] == candidates]] += 1
+            # k번째 점수가 올라가면 더 이상 따라잡을 수 없는 후보도 제외
+            remaining = len(terms) - i - 1
+            candidate_scores = scores[candidates]
+            if len(candidates) > k:
+                threshold = np.partition(candidate_scores, len(candidates) - k)[len(candidates) - k]
+                candidates = candidates[candidate_scores + remaining >= threshold]
+
+    if candidates is None:
+        candidates = np.flatnonzero(allowed & (scores > 0))
+    else:
+        candidates = candidates[scores[candidates] > 0]
+    order = top_k_order(scores[candidates], k, _catalog_ratings(index)[candidates], candidates)
+    selected = candidates[order]
+    return selected, scores[selected]
+
+
+def _kth_score(scores, allowed, k: int) -> int:
+    """allowed 행 중 k번째로 높은 점수 (후보가 k개 미만이면 0)"""
+    allowed_scores = scores[allowed]
+    if len(allowed_scores) < k:
+        return 0
+    return int(np.partition(allowed_scores, len(allowed_scores) - k)[len(allowed_scores) - k])
+
+
+def _catalog_ratings(index) -> np.ndarray:
+    if "rating" not in index.df.columns:
+        return np.zeros(index.size)
+    return index.numeric_values("rating")
+
+
+def _ratings(df: pd.DataFrame) -> np.ndarray:
+    if "rating" not in df.columns:
+        return np.zeros(len(df))
+    return pd.to_numeric(df["rating"], errors="coerce").to_numpy(dtype=float)
+
+
+def _ids(df: pd.DataFrame) -> np.ndarray:
+    """movie_id (카탈로그 위치). 카탈로그 밖의 DataFrame은 행 순서"""
+    index = get_catalog_index()
+    positions = index.positions(df) if index is not None else None
+    return positions if positions is not None else np.arange(len(df))
@@ -2,21 +2,27 @@
 Content recommendation logic.
 """
 
+import asyncio
+import functools
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 
 from config import *
 from filters import *
 from utils import *
 from database import *
+from catalog_index import get_catalog_index
+from ranking import rank_by_keywords, rank_frame, top_k_order
+from neighbors import similar_rows
+from title_index import canonical_title, find_titles, match_title
+from intent_router import extract_similar_title
+from query_cache import UserMetaCache, cache_namespace
+from keyword_extractor import LocalKeywordExtractor, parse_vocabulary
 
 import re
 
-keyword_columns = [
-    "Emotion", "Subject", "atmosphere", "background", "character_A", "character_B", "character_C",
-    "criminal", "family", "genre", "love", "natural_science", "religion", "social_culture", "style"
-]
-
 # 시스템 프롬프트 전체 정의
 keyword_prompt = """
 당신은 메타 키워드 분류 전문가입니다. 사용자의 인풋에서 여러 카테고리의 메타 키워드를 분류하세요.
@@ -60,11 +66,66 @@ style (킬링타임, 로맨스, 판타지, 블록버스터, 어드벤처, SF, 
 
 """
 
+user_meta_cache = UserMetaCache(cache_namespace(model_name, keyword_prompt))
+
+# 로컬 추출 결과를 그대로 쓰기 위한 최소 신뢰도 (이보다 낮으면 GPT 호출)
+local_meta_min_confidence = 0.7
+# 유사도 기반 추천에 필요한 최소 키워드 수 (부족하면 평점 기반 추천)
+similarity_min_keywords = 5
+
+_local_extractor = None
+
+def get_local_extractor():
+    """키워드 프롬프트의 어휘로 로컬 추출기를 처음 사용할 때 한 번만 생성"""
+    global _local_extractor
+    if _local_extractor is None:
+        _local_extractor = LocalKeywordExtractor(parse_vocabulary(keyword_prompt))
+    return _local_extractor
+
+def local_user_meta(query):
+    """
+    로컬 추출기의 결과를 그대로 쓸 수 있으면 user_meta, 아니면 None.
+    입력 대부분이 키워드로 설명되고, 키워드 수가 유사도 기반 추천에 충분해야 합니다
+    (키워드가 적으면 평점 기반 추천으로 빠지므로 GPT가 키워드를 더 찾도록 함).
+    """
+    user_meta, confidence = get_local_extractor().extract(query)
+    total_keywords = sum(len(v) for v in user_meta.values())
+    if confidence < local_meta_min_confidence or total_keywords < similarity_min_keywords:
+        return None
+    print(f"\n⚡ 로컬 키워드 추출 결과 (신뢰도 {confidence:.2f}):", {k: v for k, v in user_meta.items() if v})
+    return user_meta
+
 def extract_user_meta(query):
+    """
+    사용자 입력에서 메타 키워드를 추출합니다.
+    1) 키워드 목록의 값을 직접 언급한 입력은 로컬 추출기로 바로 처리
+    2) 같은(정규화된) 입력은 캐시에서 반환
+    3) 그 외의 입력만 GPT를 호출
+    """
+    user_meta = local_user_meta(query)
+    if user_meta is not None:
+        return user_meta
+
+    user_meta = user_meta_cache.get(query)
+    if user_meta is not None:
+        print("\n🔁 캐시된 키워드 추출 결과 사용:", user_meta)
+        return user_meta
+
+    user_meta = extract_user_meta_with_llm(query)
+    # 실패(빈 결과)는 캐시하지 않아 다음 요청에서 다시 시도
+    if user_meta:
+        user_meta_cache.put(query, user_meta)
+    return user_meta
+
+def get_user_meta_cache_stats() -> dict:
+    """키워드 추출 캐시의 hit/miss 통계"""
+    return user_meta_cache.stats()
+
+def extract_user_meta_with_llm(query):
     try:
         system_prompt = keyword_prompt
         response = openai.ChatCompletion.create(
-            model="gpt-4.1-mini",
+            model=model_name,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": f"사용자 입력:\n{query}\n\n위 입력에서 키워드를 정리해 주세요."}
@@ -87,33 +148,21 @@ def extract_user_meta(query):
 
 def recommend_contents(user_input, extract_user_meta, df, previous_recommend_titles=set()):
     user_meta = extract_user_meta(user_input)
-    df["score"] = df.apply(lambda row: get_content_score(row, user_meta), axis=1)
-    filtered_df = df[~df["title"].isin(previous_recommend_titles)]
-    df_recommend = filtered_df[filtered_df["score"] > 0].sort_values(by="score", ascending=False).head(5)
-    return df_recommend
-
-def Enoung_recommend_contents(extract_user_meta, df, user_id):
+    return rank_by_keywords(df, user_meta, mask=~df["title"].isin(previous_recommend_titles).to_numpy())
 
-    previous_titles = get_previous_recommendations(user_id)
+def Enoung_recommend_contents(extract_user_meta, df, user_id, profile=None):
 
-    # 1. 싫어하는 영화 필터링
-    disliked_items = get_user_dislikes(user_id)
-    disliked_titles = [value for category, value in disliked_items if category == "title"]
+    # 1. 싫어하는 영화/이전 추천 영화 (프로필은 메모리에서 가져옴)
+    if profile is None:
+        profile = get_user_profile(user_id)
 
-    # 2. 필터링 적용
-    filtered_df = df.copy()
-    filtered_df = filtered_df[~filtered_df["title"].isin(previous_titles + disliked_titles)]
+    # 2. 제외 마스크를 적용한 뒤 3. 점수 상위 5개 반환
+    return rank_by_keywords(df, extract_user_meta, mask=~profile.exclusion_mask(df, categories=False))
 
-    # 3. 점수 계산
-    filtered_df["score"] = filtered_df.apply(lambda row: get_content_score(row, extract_user_meta), axis=1)
 
-    # 4. 추천 결과 반환
-    df_recommend = filtered_df[filtered_df["score"] > 0].sort_values(by="score", ascending=False).head(5)
-    return df_recommend
 
-
-
-def generate_recommendation_response(user_input, df_recommend, user_name, is_retry=False):
+def build_recommendation_messages(user_input, df_recommend, user_name, is_retry=False):
+    """추천 응답 생성을 위한 GPT 메시지 목록 구성"""
     seen_titles = set()
     filtered_rows = []
 
@@ -170,41 +219,113 @@ def generate_recommendation_response(user_input, df_recommend, user_name, is_ret
 4. 친구처럼 부드러운 말투와 이모지를 사용하세요.
 """
 
+    return [
+        {"role": "system", "content": "당신은 친구처럼 따뜻하게 공감해주는 콘텐츠 큐레이터입니다."},
+        {"role": "user", "content": prompt}
+    ]
+
+def generate_recommendation_response(user_input, df_recommend, user_name, is_retry=False):
     # GPT 응답 생성
     response = openai.ChatCompletion.create(
         model=model_name,
-        messages=[
-            {"role": "system", "content": "당신은 친구처럼 따뜻하게 공감해주는 콘텐츠 큐레이터입니다."},
-            {"role": "user", "content": prompt}
-        ],
+        messages=build_recommendation_messages(user_input, df_recommend, user_name, is_retry),
         temperature=0.3
     )
 
     return response["choices"][0]["message"]["content"]
 
-
+def stream_recommendation_response(user_input, df_recommend, user_name, is_retry=False):
+    """
+    generate_recommendation_response의 스트리밍 버전.
+    GPT가 생성하는 토큰을 도착하는 대로 yield 합니다. (전체 텍스트는 호출 측에서 이어 붙임)
+    """
+    response = openai.ChatCompletion.create(
+        model=model_name,
+        messages=build_recommendation_messages(user_input, df_recommend, user_name, is_retry),
+        temperature=0.3,
+        stream=True
+    )
+    for chunk in response:
+        token = chunk["choices"][0].get("delta", {}).get("content")
+        if token:
+            yield token
+
+
+
+def resolve_catalog_title(title, df, key=None):
+    """
+    입력한 제목을 df에 있는 카탈로그 제목으로 바꿉니다 (정확히 일치 → 접두사 → 포함 → 오타 순).
+    key(제목 키)를 주면 검색하지 않고 그 키의 행을 사용합니다.
+    (제목, 같은 영화의 판본 행 마스크)를 반환하고, 찾지 못하면 (None, None)을 반환합니다.
+    """
+    index = get_catalog_index()
+    positions = index.positions(df) if index is not None else None
+    if positions is None:
+        if title not in df["title"].values:
+            return None, None
+        return title, (df["title"] == title).to_numpy()
+
+    titles_index = index.title_index()
+    if key is None:
+        key = titles_index.resolve_key(title)
+    if key is None:
+        return None, None
+    same_movie = np.isin(positions, titles_index.postings[key])
+    if not same_movie.any():
+        return None, None
+    # 입력과 똑같은 제목이 있으면 그 제목, 아니면 df에서 처음 나오는 판본
+    exact = (df["title"].astype(str) == title).to_numpy() & same_movie
+    row = np.flatnonzero(exact if exact.any() else same_movie)[0]
+    return df["title"].iloc[row], same_movie
+
+def spot_catalog_title(user_input, span=None):
+    """
+    span(추출된 제목 구간) 안에서 언급된 카탈로그 제목의 (start, end, key).
+    여럿이면 마지막 것('비슷한'에 가장 가까운 것)을 고르고, 없으면 None을 반환합니다.
+    span이 없으면 찾지 않습니다 ("가족이랑 볼 비슷한 영화"의 '가족'은 제목이 아님).
+    """
+    index = get_catalog_index()
+    if index is None or span is None:
+        return None
+    mentions = index.title_spotter().spot(user_input)
+    mentions = [m for m in mentions if span[0] <= m[0] and m[1] <= span[1]]
+    return mentions[-1] if mentions else None
 
 def recommend_similar_contents(user_input, extract_user_meta, df, keyword_columns):
-    # 더 넓은 범위를 커버하는 정규표현식
-    title_match = re.search(r'(.+?)(?:이랑|랑|과|와|같은|처럼.*?)\s*비슷한\s*영화', user_input) \
-               or re.search(r'(.+?)\s*같은\s*영화', user_input) \
-               or re.search(r'(.+?)\s*처럼\s*\S+\s*영화', user_input)
+    # 더 넓은 범위를 커버하는 정규표현식 (intent_router.similar_title_patterns)
+    title_span = extract_similar_title(user_input)
 
-    if not title_match:
+    if title_span is None:
         return pd.DataFrame()
 
-    title = title_match.group(1).strip()
+    # 추출된 구간 속 카탈로그 제목 언급 ("어제 본 기생충이랑 비슷한 영화" → "기생충")
+    mention = spot_catalog_title(user_input, title_span)
+    if mention is not None:
+        title, key = user_input[mention[0]:mention[1]], mention[2]
+    else:
+        title, key = user_input[title_span[0]:title_span[1]], None
     print(f"🎯 추출된 영화 제목: {title}")
 
-    if title not in df["title"].values:
+    resolved, same_movie = resolve_catalog_title(title, df, key)
+    if resolved is None:
         print(f"⚠️ '{title}'은(는) 데이터셋에 존재하지 않습니다.")
         return pd.DataFrame()
+    if str(resolved) != title:
+        print(f"🔁 '{title}' → '{resolved}'")
+    title = resolved
+    # 같은 영화의 다른 판본(더빙/자막 등)은 추천 대상에서 제외
+    df = df[~same_movie | (df["title"] == title).to_numpy()]
+
+    # 오프라인으로 만든 이웃 테이블이 있으면 조회 후 제외 필터링만 함
+    similar = similar_rows(df, title, columns=keyword_columns)
+    if similar is not None:
+        return similar
 
     reference_row = df[df["title"] == title].iloc[0]
     user_meta = {col: str(reference_row[col]).split(",") for col in keyword_columns}
 
-    df["score"] = df.apply(lambda row: get_content_score(row, user_meta), axis=1)
-    return df[df["title"] != title].sort_values(by="score", ascending=False).head(5)
+    scores = get_content_scores(df, user_meta).to_numpy()
+    return rank_frame(df, scores, mask=(df["title"] != title).to_numpy())
 
 
 
@@ -219,41 +340,60 @@ def recommend_by_movie_info_and_meta(user_input: str, df: pd.DataFrame, extract_
     user_meta = extract_user_meta(user_input)
 
     # 3. df_filtered 내부에서 메타 키워드로 추가 필터링
-    def get_meta_score(row):
-        score = 0
-        for category, keywords in user_meta.items():
-            content_keywords = str(row.get(category, "")).split(",")
-            matched = set(keywords) & set(map(str.strip, content_keywords))
-            score += len(matched)
-        return score
-
-    df_filtered["score"] = df_filtered.apply(get_meta_score, axis=1)
-    df_result = df_filtered[df_filtered["score"] > 0].sort_values(by="score", ascending=False)
+    df_result = rank_by_keywords(df_filtered, user_meta)
 
     if df_result.empty:
         # 메타 매칭이 없다면, 제작 키워드 필터링만 적용된 것 중 평점순으로 추천
-        df_result = df_filtered.sort_values(by="rating", ascending=False)
+        df_result = rank_frame(df_filtered, np.zeros(len(df_filtered), dtype=np.int64))
 
-    return df_result.head(5)
+    return df_result
 
 # ✅ 문서 길이 자르기
 
 
 
 def fallback_recommend_by_rating(user_meta: dict, df: pd.DataFrame, top_n=3) -> pd.DataFrame:
+    """
+    키워드 중 하나라도 들어 있는 영화를 평점 순으로 top_n개 반환합니다.
+    카탈로그의 미리 정렬된 평점 순서를 따라가며 영화별 검색 텍스트를 확인하고,
+    top_n개를 찾으면 바로 멈춥니다.
+    """
     keywords = [kw for values in user_meta.values() for kw in values]
     if not keywords:
         return pd.DataFrame()
-    regex = '|'.join(map(re.escape, keywords))
-    filtered_df = df[df.apply(lambda row: bool(re.search(regex, str(row), re.IGNORECASE)), axis=1)]
-    return filtered_df.sort_values(by="rating", ascending=False).head(top_n)
+    regex = re.compile('|'.join(map(re.escape, keywords)), re.IGNORECASE)
+
+    index = get_catalog_index()
+    positions = index.positions(df) if index is not None else None
+    if positions is None:
+        rows = np.flatnonzero([bool(regex.search(str(row))) for _, row in df.iterrows()])
+        ratings = pd.to_numeric(df["rating"], errors="coerce").to_numpy(dtype=float)[rows]
+        return df.iloc[rows[top_k_order(np.zeros(len(rows)), top_n, ratings)]]
+
+    # 카탈로그 위치 → df의 행 번호
+    frame_rows = np.full(index.size, -1, dtype=np.int64)
+    frame_rows[positions] = np.arange(len(positions))
+    texts = index.search_texts()
+
+    selected = []
+    for pos in index.descending_order("rating").tolist():
+        row = frame_rows[pos]
+        if row >= 0 and regex.search(texts[pos]):
+            selected.append(row)
+            if len(selected) >= top_n:
+                break
+    return df.iloc[selected]
 
 # ✅ 유사 콘텐츠 추천 함수 (정규표현식 강화 버전)
 
 
 
-def handle_recommendation(df, user_id, user_meta, selected_title=None):
+def handle_recommendation(df, user_id, user_meta, selected_title=None, profile=None):
     print("✅ handle_recommendation")
+    # 필터와 추천 함수가 같은 사용자 프로필을 사용
+    if profile is None:
+        profile = get_user_profile(user_id)
+
     if selected_title:
         if isinstance(selected_title, list):
             exclude = selected_title
@@ -263,7 +403,7 @@ def handle_recommendation(df, user_id, user_meta, selected_title=None):
         exclude = []
 
     # 기존 apply_user_filters로 비선호나 이전 선택 제외 후,
-    filtered_df = apply_user_filters(df, user_id)
+    filtered_df = apply_user_filters(df, user_id, profile=profile)
     # 추가로 exclude 리스트에 든 제목들 모두 제외
     filtered_df = filtered_df[~filtered_df["title"].isin(exclude)]
     # 1) 사용자 비선호/이전추천 제외 필터링
@@ -273,12 +413,12 @@ def handle_recommendation(df, user_id, user_meta, selected_title=None):
     total_keywords = sum(len(v) for v in user_meta.values())
 
     # 3) 키워드 충분 여부에 따라 분기
-    if total_keywords >= 5:
+    if total_keywords >= similarity_min_keywords:
         print("✅ 키워드가 충분하므로 유사도 기반 추천 실행")
         # recommend_contents의 시그니처도 아래처럼 바꿔주세요:
         # recommend_contents(user_meta, filtered_df, user_id)
         # return recommend_contents(user_meta, filtered_df, user_id)
-        return Enoung_recommend_contents(user_meta, filtered_df, user_id)
+        return Enoung_recommend_contents(user_meta, filtered_df, user_id, profile)
     else:
         print("⚠️ 키워드가 부족하므로 정규표현식 기반 평점 추천 실행")
         return fallback_recommend_by_rating(user_meta, filtered_df)
@@ -313,15 +453,24 @@ def handle_completion(query, last_recommend_df, interaction_id, user_id):
         print("⚠️ 선택한 영화 제목이 없습니다. 다시 입력해주세요.")
         return None
 
-    def normalize_title(text):
-        return re.sub(r"[^\w\s가-힣]", "", text).lower()
-
-    possible_title_clean = normalize_title(possible_title)
+    # 카탈로그 행이면 미리 만든 제목 키를 사용
+    titles = last_recommend_df["title"].tolist()
+    index = get_catalog_index()
+    positions = index.positions(last_recommend_df) if index is not None else None
+    if positions is not None:
+        row_keys = index.title_index().row_keys
+        keys = [row_keys[pos] for pos in positions.tolist()]
+        spotter = index.title_spotter()
+    else:
+        keys = [canonical_title(title) for title in titles]
+        spotter = None
 
-    matched_titles = [
-        title for title in last_recommend_df["title"].tolist()
-        if possible_title_clean in normalize_title(title)
-    ]
+    # 문장 속에 추천 목록의 제목이 언급되었으면 그 제목, 아니면 포함/오타 비교
+    mentioned = [key for _, _, key in find_titles(query, titles, spotter)]
+    if mentioned:
+        matched_titles = [titles[keys.index(mentioned[0])]]
+    else:
+        matched_titles = [titles[i] for i in match_title(possible_title, keys)]
 
     if matched_titles:
         selected_title = matched_titles[0]
@@ -331,10 +480,78 @@ def handle_completion(query, last_recommend_df, interaction_id, user_id):
         return selected_title
     else:
         print("🧾 추천된 영화 목록:")
-        for title in last_recommend_df["title"].tolist():
-            print(f"  - {title} (cleaned: {normalize_title(title)})")
+        for title, key in zip(titles, keys):
+            print(f"  - {title} (cleaned: {key})")
 
-        print(f"📝 사용자 입력 제목: {possible_title} (cleaned: {normalize_title(possible_title)})")
+        print(f"📝 사용자 입력 제목: {possible_title} (cleaned: {canonical_title(possible_title)})")
         print("⚠️ 추천된 영화 중 해당 제목이 없습니다. 다시 확인해주세요.")
 
 
+# ✅ 추천 턴 파이프라인 (Streamlit 앱과 CLI 공용)
+
+# 추천 턴의 각 단계와 백그라운드 로그 저장을 실행하는 스레드 풀
+pipeline_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="recommend")
+
+async def _run_in_pool(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pipeline_executor, functools.partial(func, *args, **kwargs))
+
+async def _as_result(value):
+    return value
+
+async def recommend_turn(query, df, user_id, user_name, interaction_id=None, user_meta=None,
+                         selected_title=None, is_retry=False, resolve_thumbnails=None, stream=False):
+    """
+    추천 한 턴을 서로 독립적인 단계끼리 겹쳐서 실행하는 awaitable 진입점.
+
+    1) interaction 저장, 키워드 추출, 사용자 프로필(싫어요/이전 추천) 조회를 동시에 실행
+       (프로필은 사용자당 처음 한 번만 DB에서 읽음)
+    2) 프로필로 추천 목록 계산 (DB를 다시 읽지 않음)
+    3) 추천 응답 생성과 썸네일 조회(resolve_thumbnails)를 동시에 실행
+    4) 추천 로그는 write-behind 큐에 넣기만 하고 기다리지 않음
+
+    반환값: interaction_id, user_meta, df_recommend, response, thumbnails 를 담은 dict
+    stream=True이면 response 대신 토큰 generator인 response_stream을 돌려주고,
+    썸네일 조회는 기다리지 않고 thumbnails_future로 돌려줍니다 (스트리밍과 동시에 진행).
+    """
+    interaction_task = None
+    if interaction_id is None:
+        interaction_task = asyncio.ensure_future(_run_in_pool(create_interaction, user_id, query))
+
+    user_meta, profile = await asyncio.gather(
+        _run_in_pool(extract_user_meta, query) if user_meta is None else _as_result(user_meta),
+        _run_in_pool(get_user_profile, user_id),
+    )
+
+    df_recommend = await _run_in_pool(
+        handle_recommendation, df, user_id, user_meta, selected_title, profile=profile
+    )
+    if interaction_task is not None:
+        interaction_id = await interaction_task
+
+    result = {
+        "interaction_id": interaction_id,
+        "user_meta": user_meta,
+        "df_recommend": df_recommend,
+        "response": None,
+        "response_stream": None,
+        "thumbnails": {},
+        "thumbnails_future": None,
+    }
+    if df_recommend is None or df_recommend.empty:
+        return result
+
+    # 로그는 write-behind 큐에서 묶어서 커밋되므로 응답을 기다리게 하지 않음
+    log_recommendations(interaction_id, df_recommend["title"].tolist())
+
+    if stream:
+        if resolve_thumbnails:
+            result["thumbnails_future"] = pipeline_executor.submit(resolve_thumbnails, df_recommend)
+        result["response_stream"] = stream_recommendation_response(query, df_recommend, user_name, is_retry=is_retry)
+        return result
+
+    result["response"], result["thumbnails"] = await asyncio.gather(
+        _run_in_pool(generate_recommendation_response, query, df_recommend, user_name, is_retry=is_retry),
+        _run_in_pool(resolve_thumbnails, df_recommend) if resolve_thumbnails else _as_result({}),
+    )
+    return result
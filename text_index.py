@@ -0,0 +1,150 @@
+"""
+Text matching structures shared by the keyword, title and intent lookups.
+"""
+
+from collections import deque
+
+import numpy as np
+
+
+class AhoCorasick:
+    """
+    여러 패턴을 한 번의 순회로 찾는 Aho-Corasick 오토마톤.
+    add()로 패턴과 값을 등록한 뒤 build()를 호출하고, 텍스트 길이에 비례하는 시간에
+    모든 (시작, 끝, 값) 매치를 찾습니다.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._built = False
+
+    def add(self, pattern: str, value):
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), value))
+        self._built = False
+
+    def build(self):
+        """실패 링크를 BFS로 계산 (add 이후 검색 전에 한 번 호출)"""
+        queue = deque(self._goto[0].values())
+        for child in queue:
+            self._fail[child] = 0
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+        self._built = True
+        return self
+
+    def iter_matches(self, text: str):
+        """겹치는 것을 포함한 모든 매치를 (start, end, value)로 반환"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, value in out[node]:
+                yield i + 1 - length, i + 1, value
+
+    def longest_matches(self, text: str) -> list:
+        """겹치지 않는 매치만 남김 (먼저 시작하고 더 긴 매치 우선)"""
+        matches = sorted(self.iter_matches(text), key=lambda m: (m[0], m[0] - m[1]))
+        selected = []
+        end = 0
+        for start, stop, value in matches:
+            if start >= end:
+                selected.append((start, stop, value))
+                end = stop
+            elif selected and start == selected[-1][0] and stop == selected[-1][1]:
+                # 같은 구간에 여러 값이 등록된 경우 모두 유지
+                selected.append((start, stop, value))
+        return selected
+
+    def __len__(self):
+        return len(self._goto)
+
+
+class NgramIndex:
+    """
+    글자 n-gram → 문서 번호 posting list 인덱스.
+    각 문서는 여러 필드(문자열)로 이루어지며, search(pattern)은 pattern의 n-gram을 모두 가진
+    후보 문서만 골라 실제로 어떤 필드에 pattern이 들어 있는지 확인합니다.
+    (pattern이 n글자보다 짧으면 그 길이의 gram으로 찾음)
+    """
+
+    def __init__(self, documents, n: int = 2):
+        self.n = n
+        self.documents = [tuple(fields) for fields in documents]
+        buckets = {}
+        for doc_id, fields in enumerate(self.documents):
+            grams = set()
+            for field in fields:
+                for size in range(1, n + 1):
+                    grams.update(field[i:i + size] for i in range(len(field) - size + 1))
+            for gram in grams:
+                buckets.setdefault(gram, []).append(doc_id)
+        self._postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in buckets.items()}
+
+    def candidates(self, pattern: str) -> np.ndarray:
+        """pattern의 gram을 모두 가진 문서 번호 (오름차순)"""
+        if not pattern:
+            return np.arange(len(self.documents), dtype=np.int32)
+        size = min(len(pattern), self.n)
+        grams = {pattern[i:i + size] for i in range(len(pattern) - size + 1)}
+        postings = []
+        for gram in grams:
+            rows = self._postings.get(gram)
+            if rows is None:
+                return np.empty(0, dtype=np.int32)
+            postings.append(rows)
+        # 가장 짧은 posting부터 교집합
+        postings.sort(key=len)
+        result = postings[0]
+        for rows in postings[1:]:
+            result = np.intersect1d(result, rows, assume_unique=True)
+            if not len(result):
+                break
+        return result
+
+    def overlap(self, pattern: str):
+        """pattern의 n-gram을 하나 이상 가진 문서 번호와 각 문서가 가진 (서로 다른) gram 수"""
+        size = min(len(pattern), self.n)
+        grams = {pattern[i:i + size] for i in range(len(pattern) - size + 1)}
+        postings = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not postings:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+        counts = np.bincount(np.concatenate(postings), minlength=len(self.documents))
+        doc_ids = np.flatnonzero(counts)
+        return doc_ids, counts[doc_ids]
+
+    def search(self, pattern: str) -> np.ndarray:
+        """어느 한 필드라도 pattern을 포함하는 문서 번호 (오름차순)"""
+        documents = self.documents
+        return np.asarray(
+            [doc_id for doc_id in self.candidates(pattern).tolist()
+             if any(pattern in field for field in documents[doc_id])],
+            dtype=np.int32
+        )
+
+    def __len__(self):
+        return len(self._postings)
@@ -0,0 +1,335 @@
+"""
+Thumbnail resolution service shared by every session.
+
+Poster URLs are stored in SQLite with a fetch timestamp, so a content_id is
+scraped at most once per TTL across sessions, users and restarts. Lookups run
+on a small pool of reused workers (headless Chrome, or plain HTTP for static
+pages such as the local stand-in server below).
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+thumbnail_cache_path = ".cache/thumbnails.sqlite3"
+# 썸네일 페이지 주소 ({content_id} 자리에 콘텐츠 ID가 들어감)
+thumbnail_page_url = os.environ.get("THUMBNAIL_PAGE_URL", "https://www.wavve.com/player/movie?movieid={content_id}")
+# "browser"(Selenium headless Chrome) 또는 "http"(정적 HTML 파싱)
+thumbnail_fetcher = os.environ.get("THUMBNAIL_FETCHER", "browser")
+thumbnail_selector = ".detail-view-box .thumb-box .picture-area img"
+thumbnail_ttl = 7 * 24 * 3600        # 찾은 URL 재사용 기간
+thumbnail_failure_ttl = 3600         # 찾지 못한 경우 다시 시도하기까지의 기간
+
+
+class BrowserWorker:
+    """headless Chrome 한 개를 재사용하며, 고정 sleep 대신 요소가 나타날 때까지 기다립니다."""
+
+    def __init__(self, wait_timeout: float = 10):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        chrome_options = Options()
+        chrome_options.add_argument('--headless')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        self.driver = webdriver.Chrome(options=chrome_options)
+        self.wait_timeout = wait_timeout
+
+    def fetch(self, url: str):
+        """포스터 URL (페이지에 포스터가 없으면 None)"""
+        from selenium.common.exceptions import NoSuchElementException, TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        self.driver.get(url)
+        try:
+            img_tag = WebDriverWait(self.driver, self.wait_timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, thumbnail_selector))
+            )
+        except (TimeoutException, NoSuchElementException):
+            # 포스터가 없는 페이지: 브라우저는 정상이므로 계속 재사용
+            return None
+        return img_tag.get_attribute("src") or None
+
+    @staticmethod
+    def is_broken(error: Exception) -> bool:
+        """이 오류 뒤에 브라우저를 버려야 하는지 (WebDriver 오류만)"""
+        from selenium.common.exceptions import WebDriverException
+
+        return isinstance(error, WebDriverException)
+
+    def close(self):
+        self.driver.quit()
+
+
+class _PosterImageParser(HTMLParser):
+    """`.picture-area` 안의 첫 번째 <img src>를 찾음 (thumbnail_selector의 정적 HTML 버전)"""
+
+    def __init__(self):
+        super().__init__()
+        self.depth = 0
+        self.src = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if self.src is not None:
+            return
+        if self.depth and tag == "img" and attrs.get("src"):
+            self.src = attrs["src"]
+        elif self.depth:
+            self.depth += 1
+        elif "picture-area" in (attrs.get("class") or "").split():
+            self.depth = 1
+
+    def handle_endtag(self, tag):
+        if self.depth and self.src is None:
+            self.depth -= 1
+
+
+class HttpWorker:
+    """keep-alive 세션을 재사용해 정적 HTML에서 포스터 URL을 찾습니다."""
+
+    def __init__(self, wait_timeout: float = 10):
+        import requests
+
+        self.session = requests.Session()
+        self.wait_timeout = wait_timeout
+
+    def fetch(self, url: str):
+        """포스터 URL (페이지에 포스터가 없으면 None)"""
+        response = self.session.get(url, timeout=self.wait_timeout)
+        response.raise_for_status()
+        parser = _PosterImageParser()
+        parser.feed(response.text)
+        return parser.src
+
+    @staticmethod
+    def is_broken(error: Exception) -> bool:
+        """requests 세션은 요청이 실패해도 다음 요청에 그대로 쓸 수 있음"""
+        return False
+
+    def close(self):
+        self.session.close()
+
+
+thumbnail_workers = {"browser": BrowserWorker, "http": HttpWorker}
+
+
+class ThumbnailService:
+    """
+    content_id → 포스터 URL 조회 서비스.
+    SQLite 캐시(TTL) → 진행 중인 같은 조회 합류 → 워커 풀 순으로 처리합니다.
+    워커는 최대 max_workers개까지 만들어 큐에 넣고 재사용합니다.
+    """
+
+    def __init__(self, db_path: str = thumbnail_cache_path, page_url: str = thumbnail_page_url,
+                 fetcher: str = thumbnail_fetcher, max_workers: int = 2, wait_timeout: float = 10,
+                 ttl: float = thumbnail_ttl, failure_ttl: float = thumbnail_failure_ttl):
+        self.db_path = db_path
+        self.page_url = page_url
+        self.worker_class = thumbnail_workers[fetcher]
+        self.max_workers = max_workers
+        self.wait_timeout = wait_timeout
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._idle = queue.Queue()
+        self._created = 0
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnail")
+
+    # ── 캐시 ──
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS thumbnail_cache (
+                    content_id TEXT PRIMARY KEY,
+                    url TEXT,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+        return self._conn
+
+    def _is_fresh(self, url, fetched_at, now) -> bool:
+        return now - fetched_at < (self.ttl if url else self.failure_ttl)
+
+    def cached_entries(self, content_ids) -> dict:
+        """유효기간이 지나지 않은 캐시 항목을 {content_id: url 또는 None}으로 반환"""
+        ids = list(dict.fromkeys(str(c) for c in content_ids if c))
+        if not ids:
+            return {}
+        now = time.time()
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT content_id, url, fetched_at FROM thumbnail_cache WHERE content_id IN ({','.join('?' * len(ids))})",
+                ids
+            ).fetchall()
+        return {cid: url for cid, url, fetched_at in rows if self._is_fresh(url, fetched_at, now)}
+
+    def get_cached(self, content_ids) -> dict:
+        """캐시에 있는 포스터 URL만 반환 (새 조회는 하지 않음)"""
+        return {cid: url for cid, url in self.cached_entries(content_ids).items() if url}
+
+    def _store(self, content_id: str, url):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO thumbnail_cache (content_id, url, fetched_at) VALUES (?, ?, ?)",
+                (content_id, url, time.time())
+            )
+            conn.commit()
+
+    # ── 워커 풀 ──
+    def _acquire_worker(self):
+        with self._lock:
+            if self._idle.empty() and self._created < self.max_workers:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if not create:
+            return self._idle.get()
+        try:
+            return self.worker_class(wait_timeout=self.wait_timeout)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _discard_worker(self, worker):
+        with self._lock:
+            self._created -= 1
+        try:
+            worker.close()
+        except Exception:
+            pass
+
+    def _fetch(self, content_id: str):
+        url = None
+        try:
+            worker = self._acquire_worker()
+        except Exception as e:
+            print("썸네일 워커 생성 실패:", e)
+        else:
+            try:
+                url = worker.fetch(self.page_url.format(content_id=content_id))
+                self._idle.put(worker)
+            except Exception as e:
+                print("썸네일 크롤링 실패:", e)
+                if worker.is_broken(e):
+                    # 브라우저(WebDriver) 오류는 상태를 알 수 없으므로 버리고 다음에 새로 만듦
+                    self._discard_worker(worker)
+                else:
+                    self._idle.put(worker)
+            self._store(content_id, url)
+        finally:
+            with self._lock:
+                self._pending.pop(content_id, None)
+        return url
+
+    # ── 조회 ──
+    def submit(self, content_id):
+        """조회를 워커 풀에 맡기고 Future를 반환 (같은 ID를 조회 중이면 그 Future를 공유)"""
+        content_id = str(content_id)
+        with self._lock:
+            future = self._pending.get(content_id)
+            if future is None:
+                future = self._executor.submit(self._fetch, content_id)
+                self._pending[content_id] = future
+        return future
+
+    def resolve_many(self, content_ids) -> dict:
+        """캐시를 먼저 보고, 없는 ID만 병렬로 조회해 {content_id: url}을 반환 (실패한 ID는 제외)"""
+        ids = list(dict.fromkeys(str(c) for c in content_ids if c))
+        entries = self.cached_entries(ids)
+        self.hits += len(entries)
+        missing = [cid for cid in ids if cid not in entries]
+        self.misses += len(missing)
+        futures = {cid: self.submit(cid) for cid in missing}
+        for cid, future in futures.items():
+            entries[cid] = future.result()
+        return {cid: url for cid, url in entries.items() if url}
+
+    def resolve(self, content_id):
+        return self.resolve_many([content_id]).get(str(content_id))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        while not self._idle.empty():
+            self._discard_worker(self._idle.get())
+
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_thumbnail_service() -> ThumbnailService:
+    """프로세스 전체(모든 Streamlit 세션)가 공유하는 썸네일 서비스"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ThumbnailService()
+                atexit.register(_service.close)
+    return _service
+
+
+# ── 오프라인 테스트용 스탠드인 페이지 서버 ──
+class _StubPageHandler(BaseHTTPRequestHandler):
+    """Wavve 상세 페이지와 같은 구조의 HTML을 돌려줌 (movieid=missing 이면 포스터 없음)"""
+
+    def do_GET(self):
+        movieid = parse_qs(urlparse(self.path).query).get("movieid", [""])[0]
+        poster = "" if movieid == "missing" else f'<img src="https://img.example.com/{movieid}.jpg">'
+        body = (
+            "<html><body><div class='detail-view-box'><div class='thumb-box'>"
+            f"<div class='picture-area'>{poster}</div></div></div></body></html>"
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_stub_server(port: int = 0):
+    """스탠드인 서버를 백그라운드 스레드에서 띄우고 (server, page_url)을 반환"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _StubPageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    page_url = f"http://127.0.0.1:{server.server_address[1]}/player/movie?movieid={{content_id}}"
+    return server, page_url
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    server, page_url = run_stub_server()
+    with tempfile.TemporaryDirectory() as tmp:
+        service = ThumbnailService(db_path=os.path.join(tmp, "thumbnails.sqlite3"), page_url=page_url,
+                                   fetcher=os.environ.get("THUMBNAIL_FETCHER", "http"))
+        ids = ["MV_A001", "MV_B002", "missing"]
+        for attempt in ("cold", "warm"):
+            start = time.perf_counter()
+            thumbnails = service.resolve_many(ids)
+            print(f"{attempt}: {len(thumbnails)}/{len(ids)} posters in {(time.perf_counter() - start) * 1000:.1f} ms")
+        print(f"hits={service.hits} misses={service.misses}")
+        service.close()
+    server.shutdown()
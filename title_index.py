@@ -0,0 +1,279 @@
+"""
+Title resolution index over the movie catalog.
+
+Titles are folded to canonical keys: edition markers such as "(더빙)",
+"(자막)" or "[극장판]" are removed from either end, then punctuation and
+spaces are dropped and Latin letters are lowercased. A typed title is resolved
+through the exact key, a key prefix (sorted keys + binary search), a key
+substring (bigram index) and finally a bigram-filtered edit-distance match.
+
+TitleSpotter finds titles mentioned inside free text: one Aho-Corasick
+automaton over every key and its variants scans the folded query once, and
+the matches are mapped back to spans of the original text.
+"""
+
+import bisect
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from text_index import AhoCorasick, NgramIndex
+
+# 같은 영화의 다른 판본을 나타내는 표기
+edition_markers = ["더빙", "자막", "극장판", "감독판", "확장판", "무삭제판", "특별판", "배리어프리"]
+_names = "(?:" + "|".join(edition_markers) + ")"
+_marker = r"[\(\[]\s*" + _names + r"\s*[\)\]]"
+# 괄호 없이 "더빙 겨울왕국", "겨울왕국 자막"처럼 입력한 경우도 제거
+_leading_markers = re.compile(r"^\s*(?:" + _marker + r"\s*|" + _names + r"\s+)+")
+_trailing_markers = re.compile(r"(?:\s*" + _marker + r"|\s+" + _names + r")+\s*$")
+# 한글과 영문/숫자만 남김 (공백, 구두점 제거)
+_non_key_chars = re.compile(r"[^\w가-힣]|_")
+_key_chars = re.compile(r"[^\W_]|[가-힣]")
+# "스타워즈: 라스트 제다이"의 "스타워즈" 같은 부제 앞부분
+_subtitle_separator = re.compile(r"\s*(?::|\s-\s)")
+# "알라딘 (2019)"처럼 제목 뒤에 붙은 개봉 연도
+_year_suffix = re.compile(r"\s*\(\d{4}\)\s*$")
+
+
+def strip_edition_markers(title) -> str:
+    """앞뒤의 (더빙), (자막), [극장판] 등 판본 표기를 제거한 제목"""
+    title = _leading_markers.sub("", str(title))
+    return _trailing_markers.sub("", title).strip()
+
+
+def canonical_title(title) -> str:
+    """제목 비교용 키: 판본 표기, 공백, 구두점을 없애고 소문자로 변환"""
+    return _non_key_chars.sub("", strip_edition_markers(title)).lower()
+
+
+def edit_distance(a: str, b: str, max_distance: int, prefix: bool = False) -> int:
+    """
+    Levenshtein 거리 (max_distance를 넘으면 max_distance + 1).
+    prefix=True이면 b의 접두사 중 a와 가장 가까운 것과의 거리를 구합니다.
+    """
+    if (len(a) - len(b) if prefix else abs(len(a) - len(b))) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(min(previous) if prefix else previous[-1], max_distance + 1)
+
+
+def match_title(title, keys) -> list:
+    """
+    keys(canonical_title 값 목록) 중 title에 맞는 것의 번호를 순서대로 반환합니다.
+    title의 키를 포함하는 것이 없으면 편집 거리가 가장 가까운 하나를 찾습니다.
+    """
+    key = canonical_title(title)
+    if not key:
+        return []
+    matched = [i for i, candidate in enumerate(keys) if key in candidate]
+    if matched:
+        return matched
+    max_distance = max(1, len(key) // 4)
+    distance, i = min(((edit_distance(key, candidate, max_distance), i) for i, candidate in enumerate(keys)),
+                      default=(max_distance + 1, -1))
+    return [i] if distance <= max_distance else []
+
+
+class TitleIndex:
+    """
+    정규화된 제목 키 → 카탈로그 행 위치(movie_id) 인덱스.
+    키 번호는 카탈로그에서 그 키가 처음 나오는 순서입니다.
+    """
+
+    def __init__(self, titles, fuzzy_candidates: int = 32):
+        self.fuzzy_candidates = fuzzy_candidates
+        self.row_keys = [canonical_title(title) for title in titles]
+        buckets = {}
+        for pos, key in enumerate(self.row_keys):
+            buckets.setdefault(key, []).append(pos)
+        buckets.pop("", None)
+        self.keys = list(buckets)
+        self.postings = {key: np.asarray(rows, dtype=np.int32) for key, rows in buckets.items()}
+        self._key_ids = {key: i for i, key in enumerate(self.keys)}
+        # 접두사 검색용 정렬된 키 목록
+        self._sorted_keys = sorted(self.keys)
+        self._grams = NgramIndex(((key,) for key in self.keys), n=2)
+
+    def exact(self, title) -> np.ndarray:
+        """키가 정확히 같은 행 위치"""
+        return self.postings.get(canonical_title(title), np.empty(0, dtype=np.int32))
+
+    def prefix_keys(self, title, limit: int = None) -> list:
+        """키가 title의 키로 시작하는 키 목록 (가나다순)"""
+        key = canonical_title(title)
+        if not key:
+            return []
+        start = bisect.bisect_left(self._sorted_keys, key)
+        stop = bisect.bisect_left(self._sorted_keys, key + "\U0010ffff", lo=start)
+        if limit is not None:
+            stop = min(stop, start + limit)
+        return self._sorted_keys[start:stop]
+
+    def substring_keys(self, title) -> list:
+        """title의 키를 포함하는 키 목록 (카탈로그 순서)"""
+        key = canonical_title(title)
+        if not key:
+            return []
+        return [self.keys[i] for i in self._grams.search(key).tolist()]
+
+    def fuzzy_keys(self, title, max_distance: int = None, prefix: bool = False) -> list:
+        """
+        편집 거리가 max_distance 이하인 키를 (거리, 키) 순으로 반환합니다.
+        prefix=True이면 키의 접두사와 비교합니다 ("반지의 제욍" → "반지의제왕두개의탑").
+        공유하는 bigram이 많은 키 fuzzy_candidates개만 편집 거리를 계산합니다.
+        """
+        key = canonical_title(title)
+        if not key:
+            return []
+        if max_distance is None:
+            # 세 글자 이하는 오타 하나로도 다른 제목이 되므로 정확히 일치할 때만 찾음
+            max_distance = len(key) // 4
+        if max_distance == 0:
+            return []
+        key_ids, shared = self._grams.overlap(key)
+        if not len(key_ids):
+            return []
+        # 편집 한 번은 bigram을 최대 두 개 바꾸므로 공유 gram이 너무 적은 키는 제외
+        grams = len({key[i:i + 2] for i in range(len(key) - 1)}) or 1
+        keep = shared >= grams - 2 * max_distance
+        key_ids, shared = key_ids[keep], shared[keep]
+        order = np.lexsort((key_ids, -shared))[:self.fuzzy_candidates]
+
+        matches = []
+        for i in key_ids[order].tolist():
+            distance = edit_distance(key, self.keys[i], max_distance, prefix)
+            if distance <= max_distance:
+                matches.append((distance, abs(len(self.keys[i]) - len(key)), i))
+        return [(distance, self.keys[i]) for distance, _, i in sorted(matches)]
+
+    def resolve_key(self, title):
+        """
+        입력한 제목에 가장 잘 맞는 키 (없으면 None).
+        정확히 일치 → 접두사 → 포함 → 편집 거리(전체, 접두사) 순으로 찾고,
+        여러 개면 가장 짧은 키(같으면 카탈로그 순서)를 고릅니다.
+        """
+        key = canonical_title(title)
+        if not key:
+            return None
+        if key in self.postings:
+            return key
+        for find_keys in (self.prefix_keys, self.substring_keys):
+            keys = find_keys(key)
+            if keys:
+                return min(keys, key=lambda k: (len(k), self._key_ids[k]))
+        fuzzy = self.fuzzy_keys(key) or self.fuzzy_keys(key, prefix=True)
+        return fuzzy[0][1] if fuzzy else None
+
+    def resolve(self, title) -> np.ndarray:
+        """입력한 제목에 가장 잘 맞는 키의 행 위치 (없으면 빈 배열)"""
+        key = self.resolve_key(title)
+        return self.postings[key] if key is not None else np.empty(0, dtype=np.int32)
+
+
+def _is_ascii_alnum(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+class TitleSpotter:
+    """
+    문장 안에서 언급된 제목을 찾는 Aho-Corasick 오토마톤.
+    제목마다 키(canonical_title)와 변형(판본 표기를 남긴 키, ':' 앞의 본제목, 연도를 뺀 제목)을 등록하고,
+    입력을 같은 방식으로 접은 뒤 한 번만 순회하므로 검색 시간은 제목 수가 아니라 입력 길이에 비례합니다.
+    한 패턴이 여러 제목의 변형이면 ("뮬란" → 뮬란, 뮬란 (2020)) 그 키를 모두 기억합니다.
+    """
+
+    def __init__(self, titles):
+        patterns = {}
+        for title in titles:
+            key = canonical_title(title)
+            if key:
+                patterns[key] = [key]
+        self.keys = set(patterns)
+        key_order = {key: i for i, key in enumerate(patterns)}
+
+        variants = {}
+        for title in titles:
+            key = canonical_title(title)
+            if not key:
+                continue
+            stripped = strip_edition_markers(title)
+            main_title = canonical_title(_subtitle_separator.split(stripped, 1)[0])
+            without_year = canonical_title(_year_suffix.sub("", stripped))
+            for variant in (_non_key_chars.sub("", str(title)).lower(), main_title, without_year):
+                if len(variant) >= 2 and variant != key:
+                    variants.setdefault(variant, set()).add(key)
+        for variant, keys in variants.items():
+            # 제목 키 자체가 먼저, 그다음 resolve_key처럼 짧은 키(같으면 카탈로그 순서)
+            owner = patterns.setdefault(variant, [])
+            owner.extend(sorted(keys - set(owner), key=lambda k: (len(k), key_order[k])))
+
+        self.automaton = AhoCorasick()
+        for pattern, keys in patterns.items():
+            self.automaton.add(pattern, tuple(keys))
+        self.automaton.build()
+
+    def spot(self, text: str, keys=None) -> list:
+        """
+        text에서 언급된 제목을 (start, end, key) 목록으로 반환합니다 (원문 기준 구간, 앞에서부터).
+        keys를 주면 그 키의 제목만 찾습니다 (변형이 여러 제목에 해당하면 keys에 있는 것).
+        겹치면 먼저 시작하고 더 긴 것을 고르며, 단어 중간에서 시작하는 매치는 버립니다.
+        한 글자 제목과 영문/숫자로 끝나는 제목은 뒤쪽도 단어 경계여야 합니다 ("21" ≠ "2021년").
+        """
+        text = str(text)
+        chars, origin = [], []
+        for match in _key_chars.finditer(text):
+            for ch in match.group().lower():
+                chars.append(ch)
+                origin.append(match.start())
+
+        matches = []
+        for start, end, candidates in self.automaton.iter_matches("".join(chars)):
+            if keys is None:
+                key = candidates[0]
+            else:
+                key = next((k for k in candidates if k in keys), None)
+                if key is None:
+                    continue
+            first, last = origin[start], origin[end - 1] + 1
+            if first and _key_chars.match(text, first - 1):
+                continue
+            if last < len(text) and (
+                (end - start == 1 and _key_chars.match(text, last))
+                or (_is_ascii_alnum(chars[end - 1]) and _is_ascii_alnum(text[last]))
+            ):
+                continue
+            matches.append((first, last, key))
+
+        selected = []
+        for start, end, key in sorted(matches, key=lambda m: (m[0], m[0] - m[1])):
+            if not selected or start >= selected[-1][1]:
+                selected.append((start, end, key))
+        return selected
+
+
+@lru_cache(maxsize=64)
+def _titles_spotter(titles: tuple) -> TitleSpotter:
+    return TitleSpotter(titles)
+
+
+def find_titles(text, titles, spotter: TitleSpotter = None) -> list:
+    """
+    text에서 언급된 titles 중 하나의 (start, end, key) 목록.
+    spotter(카탈로그 전체)가 titles의 키를 모두 가지고 있으면 그것으로 찾고, 아니면 titles만으로 만든 것을 씁니다.
+    """
+    titles = tuple(str(title) for title in titles)
+    keys = {canonical_title(title) for title in titles}
+    keys.discard("")
+    if not keys:
+        return []
+    if spotter is None or not keys <= spotter.keys:
+        spotter = _titles_spotter(titles)
+    return spotter.spot(text, keys)
@@ -0,0 +1,131 @@
+"""
+Per-user profile cache used by the recommendation filters.
+
+A profile holds a user's disliked titles, category dislikes and previously
+recommended titles. It is read from the database once and then kept current by
+the write helpers, so filtering a turn does not touch SQLite. Exclusion is a
+boolean mask over catalog row positions.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from catalog_index import get_catalog_index, split_keywords
+
+# 메모리에 유지할 최대 프로필 수 (오래 쓰지 않은 사용자부터 제거)
+profile_capacity = 1024
+
+
+class UserProfile:
+    """
+    한 사용자의 싫어요/이전 추천 목록.
+    add_dislike / add_recommendations로 갱신하면 캐시된 카탈로그 마스크도 함께 갱신됩니다.
+    """
+
+    def __init__(self, user_id, disliked_items=(), previous_titles=()):
+        self.user_id = user_id
+        self.disliked_titles = set()
+        self.category_dislikes = []   # [(category, value)] 등록 순서 유지
+        self.previous_titles = set()
+        self._lock = threading.Lock()
+        # 카탈로그 인덱스별 제외 마스크: (index, 제목 마스크, 카테고리 마스크)
+        self._masks = None
+        for category, value in disliked_items:
+            self.add_dislike(category, value)
+        self.add_recommendations(previous_titles)
+
+    def add_dislike(self, category: str, value: str):
+        with self._lock:
+            if category == "title":
+                if value in self.disliked_titles:
+                    return
+                self.disliked_titles.add(value)
+                self._update_masks(titles=[value])
+            elif (category, value) not in self.category_dislikes:
+                self.category_dislikes.append((category, value))
+                self._update_masks(dislikes=[(category, value)])
+
+    def add_recommendations(self, titles):
+        with self._lock:
+            new_titles = [title for title in titles if title not in self.previous_titles]
+            if new_titles:
+                self.previous_titles.update(new_titles)
+                self._update_masks(titles=new_titles)
+
+    def _update_masks(self, titles=(), dislikes=()):
+        """이미 만든 마스크가 있으면 새 항목만 반영 (읽는 쪽과 겹치지 않도록 복사 후 교체)"""
+        if self._masks is None:
+            return
+        index, title_mask, category_mask = self._masks
+        if titles:
+            title_mask = title_mask | index.title_mask(titles)
+        if dislikes:
+            category_mask = category_mask | index.token_mask(dislikes)
+        self._masks = (index, title_mask, category_mask)
+
+    def catalog_masks(self, index):
+        """카탈로그 전체 행에 대한 (제목 제외 마스크, 카테고리 제외 마스크)"""
+        with self._lock:
+            if self._masks is None or self._masks[0] is not index:
+                title_mask = index.title_mask(self.previous_titles | self.disliked_titles)
+                # 카테고리 싫어요 전체를 토큰 인덱스로 한 번에 마스크로 변환
+                category_mask = index.token_mask(self.category_dislikes)
+                self._masks = (index, title_mask, category_mask)
+            return self._masks[1], self._masks[2]
+
+    def exclusion_mask(self, frame, extra_titles=(), categories: bool = True) -> np.ndarray:
+        """
+        frame의 각 행을 제외할지 여부 (frame 행 순서의 bool 배열).
+        이전 추천/싫어요 제목과 extra_titles는 항상, 카테고리 싫어요는 categories=True일 때 제외합니다.
+        """
+        index = get_catalog_index()
+        positions = index.positions(frame) if index is not None else None
+        if positions is None:
+            return self._frame_mask(frame, extra_titles, categories)
+
+        title_mask, category_mask = self.catalog_masks(index)
+        mask = title_mask[positions]
+        if categories:
+            mask = mask | category_mask[positions]
+        if extra_titles:
+            mask = mask | index.title_mask(extra_titles)[positions]
+        return mask
+
+    def _frame_mask(self, frame, extra_titles, categories: bool) -> np.ndarray:
+        """카탈로그 인덱스를 쓸 수 없는 DataFrame은 직접 계산"""
+        with self._lock:
+            titles = self.previous_titles | self.disliked_titles | set(extra_titles)
+            dislikes = list(self.category_dislikes) if categories else []
+        mask = frame["title"].isin(titles).to_numpy()
+        for category, value in dislikes:
+            if category in frame.columns:
+                value = str(value).strip()
+                mask = mask | frame[category].map(lambda v: value in split_keywords(v)).to_numpy(dtype=bool)
+        return mask
+
+
+_profiles = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def get_cached_profile(db_path: str, user_id):
+    """메모리에 있는 프로필 (없으면 None)"""
+    with _profiles_lock:
+        profile = _profiles.get((db_path, user_id))
+        if profile is not None:
+            _profiles.move_to_end((db_path, user_id))
+        return profile
+
+
+def cache_profile(db_path: str, user_id, profile: UserProfile) -> UserProfile:
+    """프로필을 등록합니다. 다른 스레드가 먼저 등록했다면 그 프로필을 반환합니다."""
+    with _profiles_lock:
+        existing = _profiles.get((db_path, user_id))
+        if existing is not None:
+            return existing
+        _profiles[(db_path, user_id)] = profile
+        while len(_profiles) > profile_capacity:
+            _profiles.popitem(last=False)
+        return profile
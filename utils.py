@@ -7,28 +7,32 @@ from typing import List, Tuple
 
 import pandas as pd
 
+from catalog_index import get_catalog_index
+from config import info_columns
+from intent_router import (
+    combine_keywords, credit_pattern, exclude_keywords, find_previous_titles, follow_up_phrases, info_keywords,
+    recommendation_keywords,
+)
+from title_index import strip_edition_markers
+
 
 def normalize_title(title):
-    # (더빙), (자막), [극장판] 등 제거
-    title = re.sub(r'^[\(\[]?(더빙|자막|극장판)[\)\]]?\s*', '', title)
-    return title.strip()
+    # 앞뒤의 (더빙), (자막), [극장판] 등 제거
+    return strip_edition_markers(title)
 
 # ✅ 최종 추천 응답 생성 함수 (재추천 대응)
 def is_follow_up_question(user_input: str, previous_titles: List[str]) -> bool:
-    pattern = r"(이 중에|이중에|여기서|영화들 중에|영화 중에|추천받은 영화 중에|추천한 영화 중에|알려준 영화 중에|방금 추천한)"
+    pattern = "(" + "|".join(follow_up_phrases) + ")"
     if re.search(pattern, user_input, re.IGNORECASE):
         return True
-    for title in previous_titles:
-        if title in user_input:
-            return True
-    return False
+    # 판본 표기나 띄어쓰기가 달라도 이전 추천 제목이 언급되었는지 확인
+    return bool(find_previous_titles(user_input, previous_titles))
 
 # ✅ 재추천 판단 함수
 def is_retry_request(user_input: str) -> Tuple[bool, str]:
-    exclude_keywords = ["제외", "빼고", "빼줘", "빼서", "뺀", "제외하고", "빼고 추천", "재추천"]
     if any(kw in user_input for kw in exclude_keywords):
         return True, "제외"
-    if "다시 추천" in user_input or "다른 영화" in user_input:
+    if any(kw in user_input for kw in combine_keywords):
         return True, "결합"
     return False, ""
 
@@ -36,20 +40,16 @@ def is_retry_request(user_input: str) -> Tuple[bool, str]:
 
 # 1. 추천 요청 판단
 def is_recommendation_request(user_input: str) -> bool:
-    rec_keywords = ["추천해줘", "추천해", "볼만한", "비슷한 영화", "유사한 영화", "영화 알려줘",'보고싶어','추천해줄래']
-    return any(keyword in user_input for keyword in rec_keywords)
+    return any(keyword in user_input for keyword in recommendation_keywords)
 
 # 2. 제작 정보 관련 추천 판단
 def is_movie_info_related(user_input: str) -> bool:
-    info_keywords = ["배우", "감독", "출연", "제작", "줄거리", "내용"]
     return any(keyword in user_input for keyword in info_keywords)
 
 # ✅ 제작 정보 기반 필터링
 def filter_by_movie_info(query: str, df: pd.DataFrame) -> pd.DataFrame:
-    info_columns = ["actor", "director", "description", "cp_name"]
-
     # 1. 검색 키워드 추출
-    match = re.search(r"(.*?)(이|가)?\s*(출연|감독|제작|나오는|줄거리|내용).*?(영화)?(추천해줘|알려줘)?", query)
+    match = credit_pattern.search(query)
     if not match:
         print("❌ 제작 정보 관련 키워드 매칭 실패")
         return pd.DataFrame()
@@ -57,10 +57,15 @@ def filter_by_movie_info(query: str, df: pd.DataFrame) -> pd.DataFrame:
     keyword = match.group(1).strip()
     print(f"🔎 추출된 검색 키워드: {keyword}")
 
-    # 2. 각 컬럼별로 키워드 포함 여부 필터링
-    filtered_df = df[
-        df.apply(lambda row: any(keyword in str(row[col]) for col in info_columns), axis=1)
-    ]
+    # 2. 각 컬럼별로 키워드 포함 여부 필터링 (카탈로그의 bigram 인덱스로 후보를 찾은 뒤 확인)
+    index = get_catalog_index()
+    positions = index.positions(df) if index is not None else None
+    if positions is not None:
+        filtered_df = df[index.text_contains_mask(info_columns, keyword)[positions]]
+    else:
+        filtered_df = df[
+            df.apply(lambda row: any(keyword in str(row[col]) for col in info_columns), axis=1)
+        ]
 
     print(f"🔍 필터링된 결과 수: {len(filtered_df)}개")
 
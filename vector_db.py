@@ -3,43 +3,209 @@
 Vector store and QA chain construction helpers.
 """
 
+import hashlib
+import inspect
+import json
+import os
+import queue
+import shutil
+import threading
+import weakref
+
 from langchain.vectorstores import FAISS
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.chat_models import ChatOpenAI
 from langchain.chains import ConversationalRetrievalChain
 from langchain.memory import ConversationBufferMemory
 from langchain.text_splitter import CharacterTextSplitter
+from langchain.callbacks.base import BaseCallbackHandler
+
+from config import embedding_model_name, embedding_backend, model_name
+from embedding_cache import CachedEmbeddings, LocalHashEmbeddings
+from utils import truncate_document
+
+# 벡터스토어 디스크 캐시 위치 및 문서 분할 설정
+vectorstore_cache_dir = ".cache/faiss"
+chunk_size = 1000       # 한 청크당 최대 1,000자
+chunk_overlap = 200     # 청크 간 200자 중첩
+
+def get_embedding_model():
+    """설정된 백엔드의 임베딩 모델을 임베딩 캐시로 감싸서 반환"""
+    if embedding_backend == "local":
+        underlying = LocalHashEmbeddings()
+        name = underlying.model_name
+    else:
+        underlying = OpenAIEmbeddings(model=embedding_model_name)
+        name = embedding_model_name
+    return CachedEmbeddings(underlying, model_name=name)
 
-from config import embedding_model_name, model_name
+def vectorstore_cache_key(docs, embedding_name: str = embedding_model_name) -> str:
+    """문서 내용, 분할 설정, 임베딩 모델 이름으로 캐시 키(해시)를 만든다."""
+    digest = hashlib.sha256()
+    settings = {
+        "embedding_model": embedding_name,
+        "splitter": "CharacterTextSplitter",
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    for doc in docs:
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
 
-def build_vectorstore(docs, in_memory_limit: int = None):
+def load_cached_vectorstore(cache_path: str, embedding_model):
+    """
+    저장된 FAISS 인덱스를 불러옵니다.
+    pickle 로드를 명시적으로 허용해야 하는 버전에서만 allow_dangerous_deserialization을 넘깁니다
+    (예전 버전은 이 인자가 없어 TypeError가 나고, 그러면 매번 다시 임베딩하게 됨).
+    """
+    kwargs = {}
+    if "allow_dangerous_deserialization" in inspect.signature(FAISS.load_local).parameters:
+        # build_vectorstore가 직접 저장한 캐시만 읽음
+        kwargs["allow_dangerous_deserialization"] = True
+    return FAISS.load_local(cache_path, embedding_model, **kwargs)
+
+def build_vectorstore(docs, in_memory_limit: int = None, cache_dir: str = vectorstore_cache_dir):
     """
     Build a FAISS vector store from Document objects.
     If `in_memory_limit` is given, only the first N docs will be used (useful for quick testing).
+    The built index is saved under `cache_dir` and reused while the inputs stay the same.
     """
     if in_memory_limit:
         docs = docs[:in_memory_limit]
-    embedding_model = OpenAIEmbeddings(model=embedding_model_name)
-    vectorstore = FAISS.from_documents(docs, embedding_model)
+    embedding_model = get_embedding_model()
+
+    cache_key = vectorstore_cache_key(docs, embedding_model.model_name)
+    cache_path = os.path.join(cache_dir, cache_key) if cache_dir else None
+    if cache_path and os.path.exists(os.path.join(cache_path, "index.faiss")):
+        try:
+            vectorstore = load_cached_vectorstore(cache_path, embedding_model)
+            print(f"✅ 캐시된 벡터스토어 로드: {cache_path}")
+            return vectorstore
+        except Exception as e:
+            print("❗ 벡터스토어 캐시 로드 실패, 다시 생성합니다:", e)
+
     # 1) 문서를 작은 청크로 나누기
-    splitter = CharacterTextSplitter(
-        chunk_size=1000,      # 한 청크당 최대 1,000자
-        chunk_overlap=200     # 청크 간 200자 중첩
-    )
+    splitter = CharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     split_docs = splitter.split_documents(docs)
     # 2) 분할된 문서에 대해 FAISS 벡터스토어 생성
     vectorstore = FAISS.from_documents(split_docs, embedding_model)
+
+    if cache_path:
+        # 임시 폴더에 저장한 뒤 이름을 바꿔, 저장 도중 중단되어도 깨진 캐시가 남지 않게 함
+        tmp_path = f"{cache_path}.tmp-{os.getpid()}"
+        vectorstore.save_local(tmp_path)
+        shutil.rmtree(cache_path, ignore_errors=True)
+        os.replace(tmp_path, cache_path)
     return vectorstore
 
+# 벡터스토어별 movie_id → FAISS 행 번호 목록 (벡터스토어가 사라지면 함께 정리됨)
+_movie_positions = weakref.WeakKeyDictionary()
+
+def movie_positions(vectorstore) -> dict:
+    """글로벌 벡터스토어에서 각 영화(movie_id)의 청크가 저장된 FAISS 행 번호를 찾는다."""
+    positions = _movie_positions.get(vectorstore)
+    if positions is None:
+        positions = {}
+        for i, doc_id in vectorstore.index_to_docstore_id.items():
+            movie_id = vectorstore.docstore.search(doc_id).metadata.get("movie_id")
+            if movie_id is not None:
+                positions.setdefault(movie_id, []).append(int(i))
+        _movie_positions[vectorstore] = positions
+    return positions
+
+def build_movie_subindex(vectorstore, recommend_df, embedding_model):
+    """
+    추천된 영화들만 담은 작은 FAISS 인덱스를 만든다.
+    글로벌 인덱스에 이미 있는 벡터를 그대로 가져오므로 문서를 다시 임베딩하지 않는다.
+    글로벌 인덱스에 없는 영화만 문서를 임베딩한다 (임베딩 캐시 사용).
+    """
+    positions = movie_positions(vectorstore)
+    text_embeddings, metadatas = [], []
+    missing_docs = []
+    for movie_id, row in zip(recommend_df.index, recommend_df.itertuples()):
+        rows = positions.get(int(movie_id))
+        if not rows:
+            missing_docs.append((truncate_document(row.document), {"movie_id": int(movie_id), "title": row.title}))
+            continue
+        for i in rows:
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+            text_embeddings.append((doc.page_content, vectorstore.index.reconstruct(i).tolist()))
+            metadatas.append(doc.metadata)
+
+    if missing_docs:
+        vectors = embedding_model.embed_documents([text for text, _ in missing_docs])
+        text_embeddings.extend((text, vector) for (text, _), vector in zip(missing_docs, vectors))
+        metadatas.extend(metadata for _, metadata in missing_docs)
+
+    return FAISS.from_embeddings(text_embeddings, embedding_model, metadatas=metadatas)
+
 def build_qa_chain(vectorstore):
     """Create a conversational QA chain on top of the given vector store."""
-    llm = ChatOpenAI(model_name=model_name, temperature=0.3)
+    # 답변 LLM만 스트리밍하고, 질문 재구성(condense) 단계는 스트리밍하지 않음
+    llm = ChatOpenAI(model_name=model_name, temperature=0.3, streaming=True)
+    condense_llm = ChatOpenAI(model_name=model_name, temperature=0.3)
     retriever = vectorstore.as_retriever(search_type="similarity", k=3)
     memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
     qa_chain = ConversationalRetrievalChain.from_llm(
         llm=llm,
+        condense_question_llm=condense_llm,
         retriever=retriever,
         memory=memory,
         verbose=False
     )
     return qa_chain
+
+def build_follow_up_chain(local_store):
+    """추천된 영화 서브 인덱스 위에서 후속 질문에 답하는 (메모리 없는) QA 체인"""
+    llm = ChatOpenAI(model_name=model_name, temperature=0.3, streaming=True)
+    condense_llm = ChatOpenAI(model_name=model_name, temperature=0.3)
+    return ConversationalRetrievalChain.from_llm(
+        llm=llm,
+        condense_question_llm=condense_llm,
+        retriever=local_store.as_retriever(),
+        memory=None
+    )
+
+class _TokenQueueHandler(BaseCallbackHandler):
+    """스트리밍 LLM이 생성한 토큰을 큐에 넣는 콜백"""
+
+    def __init__(self, token_queue):
+        self.token_queue = token_queue
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        self.token_queue.put(token)
+
+def stream_chain_answer(chain, inputs: dict):
+    """
+    QA 체인을 백그라운드 스레드에서 실행하며 답변 토큰을 생성되는 대로 yield 합니다.
+    스트리밍 토큰이 하나도 없으면(스트리밍 미지원) 완성된 answer를 한 번에 yield 합니다.
+    """
+    token_queue = queue.Queue()
+    done = object()
+    result = {}
+
+    def run():
+        try:
+            result["output"] = chain.invoke(inputs, config={"callbacks": [_TokenQueueHandler(token_queue)]})
+        except Exception as e:
+            result["error"] = e
+        finally:
+            token_queue.put(done)
+
+    threading.Thread(target=run, daemon=True).start()
+
+    streamed = False
+    while True:
+        token = token_queue.get()
+        if token is done:
+            break
+        streamed = True
+        yield token
+
+    if "error" in result:
+        raise result["error"]
+    if not streamed:
+        yield result["output"]["answer"]